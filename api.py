@@ -0,0 +1,323 @@
+"""
+Headless HTTP API over the triage pipeline for broker portals and internal tools.
+
+    python api.py --port 8000 --concurrency 16 --max-queue 64
+
+Endpoints (JSON in, JSON out):
+    POST /v1/parse             {"incident_text"}
+    POST /v1/broker-questions  {"incident_text", "checklist_items", optional "parse_result"}
+    POST /v1/remediation       {"incident_text", "checklist_items", "broker_questions", "broker_answers"}
+    POST /v1/batch             {"incidents": [...], optional "stages"}
+    GET  /health, GET /metrics (OpenMetrics)
+
+Identical in-flight requests are coalesced (single-flight): concurrent
+callers with the same endpoint and body share one pipeline call. Pipeline
+calls run on a bounded thread pool; once more than `max_queue` calls are
+waiting for a slot, new work is rejected with 503 and Retry-After.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from batch import STAGES, triage_incident
+from utils import (
+    assemble_broker_questions,
+    llm_generate_broker_questions_from_checklist,
+    llm_generate_suggestions_and_remediation,
+    llm_parse_incident_and_generate_all
+)
+
+MAX_BODY_BYTES = 1 << 20
+KEEPALIVE_SECONDS = 30
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Overloaded(HTTPError):
+    def __init__(self, retry_after=1):
+        super().__init__(503, "server is at capacity, retry later", {'Retry-After': str(retry_after)})
+
+
+def _require(body, field, kind):
+    value = body.get(field)
+    if not isinstance(value, kind):
+        names = ' or '.join(k.__name__ for k in kind) if isinstance(kind, tuple) else kind.__name__
+        raise HTTPError(400, f"'{field}' is required and must be a {names}")
+    return value
+
+
+def _require_strings(body, field):
+    value = _require(body, field, list)
+    if not all(isinstance(v, str) for v in value):
+        raise HTTPError(400, f"'{field}' must be a list of strings")
+    return value
+
+
+class TriageService:
+    """
+    Runs pipeline calls with single-flight coalescing, a concurrency limit
+    and a bounded wait queue.
+    """
+
+    def __init__(self, concurrency=16, max_queue=64, max_batch=100):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='api')
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.inflight = {}
+        self.waiting = 0
+        self.running = 0
+        self.stats = {'requests': 0, 'coalesced': 0, 'rejected': 0, 'errors': 0}
+
+    def admit(self, units=1):
+        """
+        Reserves `units` places in the wait queue, or raises Overloaded. Each
+        reservation is released by the _call() it was made for.
+        """
+        # Calls about to start count as waiting until they hold a slot
+        if self.waiting + self.running + units > self.concurrency + self.max_queue:
+            self.stats['rejected'] += 1
+            raise Overloaded()
+        self.waiting += units
+
+    async def _call(self, fn, *args):
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            # Carry the request's telemetry session into the worker thread
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, fn, *args)
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    async def single_flight(self, key, fn, *args, admit=True):
+        """
+        Returns fn(*args), sharing one execution between concurrent callers
+        with the same key. With admit=False the caller has already reserved a
+        queue place through admit().
+        """
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            if not admit:
+                self.waiting -= 1
+        else:
+            if admit:
+                self.admit()
+            task = asyncio.ensure_future(self._call(fn, *args))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # A caller disconnecting must not cancel the call other callers share
+        return await asyncio.shield(task)
+
+    async def parse(self, body):
+        text = _require(body, 'incident_text', str)
+        return await self.single_flight(
+            ('parse', text), llm_parse_incident_and_generate_all, text
+        )
+
+    async def broker_questions(self, body):
+        text = _require(body, 'incident_text', str)
+        items = _require_strings(body, 'checklist_items')
+        parse_result = body.get('parse_result')
+        if isinstance(parse_result, dict):
+            # Assembled locally from the parse's per-item questions when possible
+            questions = assemble_broker_questions(parse_result, items)
+            if questions is not None:
+                return {'broker_questions': questions, 'source': 'parse_result'}
+        questions = await self.single_flight(
+            ('broker_questions', text, tuple(sorted(items))),
+            llm_generate_broker_questions_from_checklist, text, items
+        )
+        return {'broker_questions': questions, 'source': 'llm'}
+
+    async def remediation(self, body):
+        text = _require(body, 'incident_text', str)
+        items = _require_strings(body, 'checklist_items')
+        questions = _require_strings(body, 'broker_questions')
+        answers = _require_strings(body, 'broker_answers')
+        if len(questions) != len(answers):
+            raise HTTPError(400, "'broker_questions' and 'broker_answers' must have the same length")
+        return await self.single_flight(
+            ('remediation', text, tuple(sorted(items)), tuple(questions), tuple(answers)),
+            llm_generate_suggestions_and_remediation, text, items, questions, answers
+        )
+
+    async def batch(self, body):
+        incidents = _require(body, 'incidents', list)
+        stages = body.get('stages') or STAGES
+        if not isinstance(stages, list) or set(stages) - set(STAGES):
+            raise HTTPError(400, "'stages' must be a subset of: " + ', '.join(STAGES))
+        if len(incidents) > self.max_batch:
+            raise HTTPError(413, f"at most {self.max_batch} incidents per batch")
+        if not all(isinstance(incident, dict) for incident in incidents):
+            raise HTTPError(400, "'incidents' must be a list of objects")
+        self.admit(len(incidents))
+        records = await asyncio.gather(*(
+            self.single_flight(('batch', json.dumps(incident, sort_keys=True), tuple(stages)),
+                               triage_incident, incident, stages, 1, admit=False)
+            for incident in incidents
+        ))
+        return {'results': records, 'failed': sum(1 for r in records if r.get('errors'))}
+
+    def health(self):
+        return {'status': 'ok', 'running': self.running, 'waiting': self.waiting,
+                'inflight_keys': len(self.inflight), 'concurrency': self.concurrency,
+                'max_queue': self.max_queue, **self.stats}
+
+
+class TriageServer:
+    """
+    Minimal HTTP/1.1 server (keep-alive, Content-Length bodies) on asyncio streams.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.routes = {
+            '/v1/parse': service.parse,
+            '/v1/broker-questions': service.broker_questions,
+            '/v1/remediation': service.remediation,
+            '/v1/batch': service.batch,
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEPALIVE_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {'error': str(e)}, e.headers, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload, extra, content_type = await self._dispatch(method, path, headers, body)
+                await self._respond(writer, status, payload, extra, keep_alive, content_type)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers or (method.upper() == 'POST' and 'content-length' not in headers):
+            # Chunked bodies aren't supported; without a length the body can't be framed
+            raise HTTPError(411, "Content-Length is required")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    async def _dispatch(self, method, path, headers, body):
+        service = self.service
+        if path == '/health' and method == 'GET':
+            return 200, service.health(), {}, 'application/json'
+        if path == '/metrics' and method == 'GET':
+            return 200, telemetry.tracer.to_openmetrics(), {}, 'application/openmetrics-text; version=1.0.0'
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {'error': f"unknown endpoint {path}"}, {}, 'application/json'
+        if method != 'POST':
+            return 405, {'error': "use POST"}, {'Allow': 'POST'}, 'application/json'
+        service.stats['requests'] += 1
+        telemetry.set_session(headers.get('x-session-id'))
+        try:
+            try:
+                data = json.loads(body or b'{}')
+            except ValueError:
+                raise HTTPError(400, "request body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            return 200, await handler(data), {}, 'application/json'
+        except HTTPError as e:
+            return e.status, {'error': str(e)}, e.headers, 'application/json'
+        except Exception as e:
+            service.stats['errors'] += 1
+            return 500, {'error': f"{type(e).__name__}: {e}"}, {}, 'application/json'
+
+    async def _respond(self, writer, status, payload, headers=None, keep_alive=True,
+                       content_type='application/json'):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(host='127.0.0.1', port=8000, concurrency=16, max_queue=64, max_batch=100):
+    service = TriageService(concurrency, max_queue, max_batch)
+    server = await asyncio.start_server(TriageServer(service).handle_connection, host, port, backlog=1024)
+    print(f"Triage API listening on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the triage pipeline over HTTP.")
+    parser.add_argument('--host', default=os.getenv('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', 8000)))
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('API_CONCURRENCY', 16)),
+                        help="pipeline calls run at once")
+    parser.add_argument('--max-queue', type=int, default=int(os.getenv('API_MAX_QUEUE', 64)),
+                        help="pipeline calls allowed to wait before returning 503")
+    parser.add_argument('--max-batch', type=int, default=int(os.getenv('API_MAX_BATCH', 100)))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.concurrency, args.max_queue, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,68 @@
 import streamlit as st
 import json
+import telemetry
+from prefetch import get_prefetcher
 from utils import (
-    llm_parse_incident_and_generate_all
+    SUGGESTIONS_SCHEMA,
+    assemble_broker_questions,
+    llm_parse_incident_and_generate_all,
+    llm_generate_broker_questions_from_checklist,
+    llm_stream_suggestions_and_remediation
 )
 
+def run_stage(name, inputs, compute, spinner_text):
+    """
+    Memoizes a pipeline stage in session state, keyed by the stage's real inputs,
+    so widget reruns only call the LLM when those inputs actually change.
+    """
+    stages = st.session_state.setdefault('stage_results', {})
+    cached = stages.get(name)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    with st.spinner(spinner_text):
+        value = compute()
+    stages[name] = (inputs, value)
+    return value
+
+def cached_stage(name, inputs):
+    """
+    Returns a stage's memoized result if it was computed for these inputs, else None.
+    """
+    cached = st.session_state.get('stage_results', {}).get(name)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    return None
+
+def tag_session():
+    """
+    Tags spans recorded in this thread with the browser session. Fragment
+    reruns run on their own thread, so each fragment calls this first.
+    """
+    telemetry.set_session(st.session_state.setdefault('telemetry_session', telemetry.new_session_id()))
+
+@st.fragment
+def render_telemetry_panel():
+    """
+    Shows per-stage latency, token and cost totals for this browser session.
+    Fragment reruns elsewhere don't redraw the sidebar, hence the refresh button.
+    """
+    rows = telemetry.tracer.summary(st.session_state['telemetry_session'])
+    st.markdown("#### ⏱️ Session latency & cost")
+    st.button("Refresh", key='telemetry_refresh')
+    if not rows:
+        st.caption("No pipeline calls yet.")
+        return
+    provider_calls = sum(r['calls'] for r in rows if r['stage'].startswith('provider.'))
+    col1, col2 = st.columns(2)
+    col1.metric("LLM calls", provider_calls)
+    col2.metric("Est. cost", f"${sum(r['cost_usd'] for r in rows):.4f}")
+    st.dataframe(rows, hide_index=True)
+    prefetch = get_prefetcher().stats()
+    st.caption(f"Prefetch hit rate {prefetch['hit_rate']:.0%} · speculative spend ${prefetch['spent_usd']:.4f} "
+               f"· {prefetch['saved_seconds']:.1f}s saved (all sessions)")
+
 st.set_page_config(page_title="Remediation Copilot", layout="wide")
+tag_session()
 st.title("Remediation Copilot for Coalition Inc.")
 
 # --- Incident Free-Text Input ---
@@ -21,87 +79,141 @@ st.markdown(
 )
 user_incident = st.text_area("Incident Description", height=100)
 
-if st.button("Analyze with AI") and user_incident.strip():
-    with st.spinner("AI is analyzing the incident and generating all outputs..."):
-        result = llm_parse_incident_and_generate_all(user_incident)
-        st.session_state['llm_result'] = result
+st.button("Analyze with AI")
 
 # --- Underwriting Checklist (AI-generated) ---
-if 'llm_result' not in st.session_state or st.session_state.get('last_incident_text') != user_incident:
-    st.session_state['llm_result'] = llm_parse_incident_and_generate_all(user_incident) if user_incident.strip() else None
-    st.session_state['last_incident_text'] = user_incident
-llm_result = st.session_state.get('llm_result', None)
+llm_result = None
+if user_incident.strip():
+    llm_result = run_stage(
+        'parse', user_incident,
+        lambda: llm_parse_incident_and_generate_all(user_incident),
+        "AI is analyzing the incident and generating all outputs..."
+    )
 
-selected_checklist = []
-if llm_result:
-    st.markdown("### ✅ Underwriting Checklist (AI-generated)")
-    checklist_items = llm_result.get('checklist', [])
-    for i, item in enumerate(checklist_items):
-        if st.checkbox(item, key=f'checklist_{i}'):
-            selected_checklist.append(item)
+# Checklist, broker questions and results are nested fragments: an interaction
+# reruns only the fragment it happened in (and the fragments inside it), never
+# the incident parse or the sidebar.
+RESULT_SECTIONS = ['risk_mitigation', 'remediation', 'recommendation', 'broker_summary', 'explanation']
+
+def render_result_field(slot, field, result):
+    """
+    Renders one result section into its placeholder; called as each field arrives.
+    """
+    if field == 'risk_mitigation' and result.get('risk_mitigation'):
+        with slot.container():
+            st.markdown("### 🛡️ Risk Mitigation Suggestions (AI-generated)")
+            for s in result['risk_mitigation']:
+                st.write(f"- {s}")
+    elif field == 'remediation' and result.get('remediation'):
+        with slot.container():
+            st.markdown("### 🛠️ Remediation Steps (AI-generated)")
+            st.success(result['remediation'])
+    elif field in ('recommendation', 'confidence') and result.get('recommendation'):
+        with slot.container():
+            st.markdown("### 📝 Underwriter Recommendation (AI-generated)")
+            st.info(f"**Recommendation:** {result['recommendation']}\n\n**Confidence:** {result.get('confidence', '')}")
+    elif field == 'broker_summary' and result.get('broker_summary'):
+        with slot.container():
+            st.markdown("### 📋 Broker Summary (AI-generated)")
+            st.text_area("2-line Broker Note", result['broker_summary'], height=68, disabled=True)
+    elif field == 'explanation' and result.get('explanation'):
+        with slot.container():
+            with st.expander("How was this recommendation derived?"):
+                st.write("""
+                The recommendation is generated by the AI based on:
+                - The incident description you provided
+                - The underwriting checklist items you selected (which reflect key risk controls and exposures)
+                - The broker's Yes/No answers to clarifying questions (which indicate the presence or absence of critical controls)
+                - The AI weighs the risk impact, control gaps, and business context to suggest the most appropriate underwriting action (Accept, Request Fix, Decline),
+                - The confidence score reflects the AI's certainty based on the completeness and quality of the information provided.
+                - The risk mitigation suggestions and remediation steps are tailored to the specific scenario and broker responses, ensuring actionable and relevant guidance for both underwriters and brokers.
+                """)
 
-# --- Broker Questions (dynamic based on checklist) ---
-broker_questions = []
-broker_answers = []
-if selected_checklist:
-    # Use LLM to generate broker questions based on selected checklist
-    with st.spinner("AI is generating broker questions based on your checklist selections..."):
-        from utils import llm_generate_broker_questions_from_checklist
-        broker_questions = llm_generate_broker_questions_from_checklist(user_incident, selected_checklist)
+@st.fragment
+def results_section(user_incident, selected_checklist, broker_questions, broker_answers):
+    """
+    Risk mitigation suggestions & remediation steps (dynamic based on broker answers).
+    """
+    tag_session()
+    results_inputs = (user_incident, frozenset(selected_checklist), tuple(broker_questions), tuple(broker_answers))
+    generate_clicked = st.button("Generate Remediation & Recommendation")
+    slots = {section: st.empty() for section in RESULT_SECTIONS}
+    session = st.session_state['telemetry_session']
+    # Keep showing results already generated for the current answers
+    result = cached_stage('remediation', results_inputs)
+    if result is None and not generate_clicked:
+        # Speculatively compute the result for the answers on screen; answer
+        # changes reschedule it (debounced, superseded work cancelled)
+        get_prefetcher().schedule(
+            session, results_inputs, user_incident, selected_checklist, broker_questions, broker_answers
+        )
+    if result is None and generate_clicked:
+        with st.spinner("AI is generating risk mitigation, remediation, and recommendations based on your answers..."):
+            # A finished or in-flight prefetch for these answers is used as-is
+            result = get_prefetcher().take(session, results_inputs)
+            if result is None:
+                # Stream fields into their sections as soon as each one is complete
+                result = {}
+                for field, value in llm_stream_suggestions_and_remediation(
+                    user_incident, selected_checklist, broker_questions, broker_answers
+                ):
+                    result[field] = value
+                    section = 'recommendation' if field == 'confidence' else field
+                    if section in slots:
+                        render_result_field(slots[section], field, result)
+            else:
+                for section in RESULT_SECTIONS:
+                    render_result_field(slots[section], section, result)
+        if all(field in result for field in SUGGESTIONS_SCHEMA):
+            st.session_state.setdefault('stage_results', {})['remediation'] = (results_inputs, result)
+        else:
+            # Leave the stage uncached so the next click tries again
+            st.error("The AI response was incomplete. Click Generate again to retry.")
+    elif result is not None:
+        for section in RESULT_SECTIONS:
+            render_result_field(slots[section], section, result)
+
+@st.fragment
+def broker_section(user_incident, llm_result, selected_checklist):
+    """
+    Broker questions (dynamic based on checklist); changing an answer reruns
+    this section and the results below it.
+    """
+    tag_session()
+    # Assemble questions locally from the per-item questions of the initial parse;
+    # only fall back to an LLM call when an item has none precomputed
+    broker_questions = assemble_broker_questions(llm_result, selected_checklist)
+    if broker_questions is None:
+        broker_questions = run_stage(
+            'broker_questions', (user_incident, frozenset(selected_checklist)),
+            lambda: llm_generate_broker_questions_from_checklist(user_incident, selected_checklist),
+            "AI is generating broker questions based on your checklist selections..."
+        )
     st.markdown("### 🤝 Broker Questions (AI-generated)")
+    broker_answers = []
     for i, q in enumerate(broker_questions):
         ans = st.radio(str(q), ['Yes', 'No'], index=0, key=f'broker_q_{i}')
         broker_answers.append(ans)
+    if broker_questions and broker_answers:
+        results_section(user_incident, selected_checklist, broker_questions, broker_answers)
 
-# --- Risk Mitigation Suggestions & Remediation Steps (dynamic based on broker answers) ---
-suggestions = []
-remediation = ''
-recommendation = ''
-confidence = ''
-broker_summary = ''
-explanation = ''
-
-show_results = False
-if broker_questions and broker_answers:
-    if st.button("Generate Remediation & Recommendation"):
-        with st.spinner("AI is generating risk mitigation, remediation, and recommendations based on your answers..."):
-            from utils import llm_generate_suggestions_and_remediation
-            result = llm_generate_suggestions_and_remediation(user_incident, selected_checklist, broker_questions, broker_answers)
-            suggestions = result.get('risk_mitigation', [])
-            remediation = result.get('remediation', '')
-            recommendation = result.get('recommendation', '')
-            confidence = result.get('confidence', '')
-            broker_summary = result.get('broker_summary', '')
-            explanation = result.get('explanation', '')
-            show_results = True
-    else:
-        show_results = False
-
-if show_results:
-    if suggestions:
-        st.markdown("### 🛡️ Risk Mitigation Suggestions (AI-generated)")
-        for s in suggestions:
-            st.write(f"- {s}")
-    if remediation:
-        st.markdown("### 🛠️ Remediation Steps (AI-generated)")
-        st.success(remediation)
-    if recommendation:
-        st.markdown("### 📝 Underwriter Recommendation (AI-generated)")
-        st.info(f"**Recommendation:** {recommendation}\n\n**Confidence:** {confidence}")
-    if broker_summary:
-        st.markdown("### 📋 Broker Summary (AI-generated)")
-        st.text_area("2-line Broker Note", broker_summary, height=68, disabled=True)
-    if explanation:
-        with st.expander("How was this recommendation derived?"):
-            st.write("""
-            The recommendation is generated by the AI based on:
-            - The incident description you provided
-            - The underwriting checklist items you selected (which reflect key risk controls and exposures)
-            - The broker's Yes/No answers to clarifying questions (which indicate the presence or absence of critical controls)
-            - The AI weighs the risk impact, control gaps, and business context to suggest the most appropriate underwriting action (Accept, Request Fix, Decline),
-            - The confidence score reflects the AI's certainty based on the completeness and quality of the information provided.
-            - The risk mitigation suggestions and remediation steps are tailored to the specific scenario and broker responses, ensuring actionable and relevant guidance for both underwriters and brokers.
-            """)
+@st.fragment
+def checklist_section(user_incident, llm_result):
+    """
+    Underwriting checklist (AI-generated); toggling an item reruns this
+    section and the broker questions and results below it.
+    """
+    tag_session()
+    st.markdown("### ✅ Underwriting Checklist (AI-generated)")
+    selected_checklist = []
+    for i, item in enumerate(llm_result.get('checklist', [])):
+        if st.checkbox(item, key=f'checklist_{i}'):
+            selected_checklist.append(item)
+    if selected_checklist:
+        broker_section(user_incident, llm_result, selected_checklist)
+
+if llm_result:
+    checklist_section(user_incident, llm_result)
 
 # --- Footnote ---
 st.markdown('<hr style="margin-top:2em;">', unsafe_allow_html=True)
@@ -109,6 +221,8 @@ st.markdown('<span style="color:red;">This app is for the application of Senior
 
 with st.sidebar:
     tab = st.radio("Navigation", ["Demo", "Description"], index=0)
+    if tab == "Demo":
+        render_telemetry_panel()
     if tab == "Description":
         st.markdown("""
         **Problem Statement**
@@ -0,0 +1,297 @@
+"""
+Headless batch triage for incident feeds.
+
+    python batch.py data/sample_incidents.json -o triage.jsonl --concurrency 16 --rpm openai=3000
+
+Incidents are streamed from a JSON array or JSONL file and each one is run
+through generate_remediation, generate_broker_questions and
+llm_parse_incident_and_generate_all with bounded concurrency. Results are
+appended to the output JSONL as they finish; the output file doubles as the
+checkpoint, so re-running the same command resumes where it stopped.
+
+With --store, incidents are read from the indexed incident store (filtered
+by --where) and each stage result is also saved next to its incident there:
+
+    python batch.py --store data/incidents.sqlite3 --where risk_level=High -o triage.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from incident_store import incident_id
+from providers import ProviderError, TokenBucket, get_pool
+from utils import (
+    generate_broker_questions,
+    generate_remediation,
+    llm_parse_incident_and_generate_all
+)
+
+STAGES = ['remediation', 'broker_questions', 'parse']
+
+
+def iter_incidents(path, chunk_size=1 << 16):
+    """
+    Yields incident dicts from a JSONL file or a JSON array without loading
+    the whole file into memory.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip whitespace, the opening bracket and separators
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if not started and pos < len(buffer):
+                    if buffer[pos] != '[':
+                        raise ValueError(f"{path}: expected a JSON array of incidents")
+                    started = True
+                    pos += 1
+                    continue
+                break
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                incident, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if buffer[pos:].strip():
+                        raise
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield incident
+            pos = end
+
+
+def incident_text(incident):
+    return f"{incident.get('title', '')}: {incident.get('description', '')}".strip(': ')
+
+
+def load_checkpoint(output_path):
+    """
+    Returns the ids already triaged without errors in an existing output file.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partial line from an interrupted run
+                continue
+            if not record.get('errors') and record.get('id') is not None:
+                done.add(str(record['id']))
+    return done
+
+
+def with_retries(fn, max_retries=3, base_delay=1.0, max_delay=30.0):
+    """
+    Calls fn(), retrying provider and network failures with exponential
+    backoff and full jitter. Configuration errors (e.g. no API key) are raised
+    immediately.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except (ProviderError, OSError, asyncio.TimeoutError):
+            if attempt >= max_retries:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+            attempt += 1
+
+
+def triage_incident(incident, stages=STAGES, max_retries=3):
+    """
+    Runs the requested pipeline stages for one incident and returns the output record.
+    """
+    record = {'id': incident_id(incident), 'title': incident.get('title')}
+    errors = {}
+    calls = {
+        'remediation': lambda: generate_remediation(incident),
+        'broker_questions': lambda: generate_broker_questions(incident),
+        # Strict: an outage must surface as an error (retried, then left for
+        # resume) instead of a rules/stub fallback that looks like a real parse
+        'parse': lambda: llm_parse_incident_and_generate_all(incident_text(incident), strict=True),
+    }
+    for stage in stages:
+        try:
+            record[stage] = with_retries(calls[stage], max_retries)
+        except Exception as e:
+            errors[stage] = f"{type(e).__name__}: {e}"
+    if errors:
+        record['errors'] = errors
+    return record
+
+
+def configure_rate_limits(rpm_limits):
+    """
+    Installs a token bucket on each provider from a {provider: requests_per_minute} map.
+    """
+    pool = get_pool()
+    for name, rpm in rpm_limits.items():
+        pool.get(name).rate_limiter = TokenBucket(rpm / 60.0, capacity=max(1.0, rpm / 60.0))
+
+
+async def run_batch(input_path, output_path, concurrency=8, stages=STAGES, max_retries=3, resume=True,
+                    store=None, filters=None):
+    """
+    Triages every incident in input_path (or, when input_path is None, every
+    incident in `store` matching `filters`) into output_path and returns a
+    summary dict. With a store, stage results are saved to it as well.
+    """
+    done = load_checkpoint(output_path) if resume else set()
+    if input_path is not None:
+        incidents = iter_incidents(input_path)
+    else:
+        incidents = (incident.to_dict() for incident in store.query(**(filters or {})))
+    mode = 'a' if resume else 'w'
+    if resume and os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    else:
+        needs_newline = False
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='triage')
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    summary = {'processed': 0, 'skipped': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    with open(output_path, mode, encoding='utf-8') as out:
+        if needs_newline:
+            out.write('\n')
+
+        async def worker():
+            while True:
+                incident = await queue.get()
+                if incident is None:
+                    return
+                try:
+                    record = await loop.run_in_executor(executor, triage_incident, incident, stages, max_retries)
+                    if store is not None:
+                        for stage in stages:
+                            if stage in record:
+                                store.save_result(record['id'], stage, record[stage])
+                    line = json.dumps(record, ensure_ascii=False)
+                except Exception as e:
+                    # One bad incident must not stop this worker: the queue would
+                    # fill up and block the producer. Logged as failed, retried on resume.
+                    record = {'id': incident_id(incident), 'title': incident.get('title'),
+                              'errors': {'batch': f"{type(e).__name__}: {e}"}}
+                    line = json.dumps(record, ensure_ascii=False, default=str)
+                out.write(line + '\n')
+                out.flush()
+                summary['processed'] += 1
+                if record.get('errors'):
+                    summary['failed'] += 1
+                if summary['processed'] % 100 == 0:
+                    rate = summary['processed'] / (time.perf_counter() - started)
+                    print(f"{summary['processed']} incidents triaged ({rate:.1f}/s)", file=sys.stderr)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            for incident in incidents:
+                key = incident_id(incident)
+                if key in done or (resume and store is not None
+                                   and set(stages) <= set(store.results_for(key))):
+                    summary['skipped'] += 1
+                    continue
+                await queue.put(incident)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+            executor.shutdown(wait=False)
+    summary['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def parse_rpm(values):
+    limits = {}
+    for value in values or []:
+        name, _, rpm = value.partition('=')
+        limits[name.strip()] = float(rpm)
+    return limits
+
+
+def parse_where(values):
+    filters = {}
+    for value in values or []:
+        field, _, wanted = value.partition('=')
+        filters.setdefault(field.strip(), []).append(wanted.strip())
+    return filters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-triage an incident feed (JSON array or JSONL).")
+    parser.add_argument('input', nargs='?', help="incident file, e.g. data/sample_incidents.json")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file results are appended to")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help="comma-separated subset of: " + ', '.join(STAGES))
+    parser.add_argument('--rpm', action='append', metavar='PROVIDER=RPM',
+                        help="per-provider requests-per-minute limit, repeatable")
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--no-resume', action='store_true', help="overwrite output instead of resuming")
+    parser.add_argument('--store', help="incident store to read from (without input) and save results to")
+    parser.add_argument('--where', action='append', metavar='FIELD=VALUE',
+                        help="incident store filter on an indexed field, repeatable")
+    args = parser.parse_args(argv)
+
+    if args.input is None and args.store is None:
+        parser.error("give an input file or --store")
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    store = None
+    if args.store:
+        from incident_store import INDEXED, IncidentStore
+        unknown = set(parse_where(args.where)) - set(INDEXED)
+        if unknown:
+            parser.error(f"--where supports: {', '.join(INDEXED)}")
+        store = IncidentStore(args.store)
+    try:
+        rpm_limits = parse_rpm(args.rpm)
+    except ValueError:
+        parser.error("--rpm expects PROVIDER=RPM, e.g. openai=3000")
+    providers = get_pool().providers
+    unknown = set(rpm_limits) - set(providers)
+    if unknown:
+        parser.error(f"unknown --rpm providers: {', '.join(sorted(unknown))} (known: {', '.join(providers)})")
+    if any(rpm <= 0 for rpm in rpm_limits.values()):
+        parser.error("--rpm limits must be positive")
+    configure_rate_limits(rpm_limits)
+    summary = asyncio.run(run_batch(
+        args.input, args.output, args.concurrency, stages, args.max_retries, not args.no_resume,
+        store, parse_where(args.where)
+    ))
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+UI rerun benchmark: starts app.py under a headless Streamlit server wired to
+the local mock LLM server and drives concurrent underwriter sessions over
+Streamlit's websocket protocol (type an incident, tick checklist items, flip
+broker answers, generate, flip again). Reports end-to-end latency per
+interaction type, bytes sent to the browser per interaction and server CPU
+per interaction (split by interaction type at concurrency 1).
+
+    python benchmarks/bench_app.py --concurrency 1,8,32 --sessions 32
+    python benchmarks/bench_app.py --compare-rev HEAD~1   # same run against an older app.py
+
+Widget interactions are sent the way the browser sends them, including the
+fragment id, so fragment-scoped reruns are measured as the server runs them.
+Needs `websockets`, a benchmark-only dependency not in requirements.txt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import session_incidents  # noqa: E402
+from mock_llm_server import MockBehavior, provider_env, start_server  # noqa: E402
+
+WIDGET_TYPES = {'text_area': 'string_value', 'checkbox': 'bool_value', 'radio': 'string_value',
+                'button': 'trigger_value'}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _cpu_seconds(pid):
+    """
+    Returns user+system CPU seconds of a process (Linux /proc), or None.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class StreamlitSession:
+    """
+    Minimal Streamlit websocket client: tracks widgets from the deltas it
+    receives and sends reruns carrying every widget's current value.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.widgets = {}
+        self.values = {}
+        self.connection = None
+        self.received_bytes = 0
+
+    async def connect(self):
+        import websockets
+        self.connection = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+
+    def find(self, kind, label=None, index=0):
+        matches = [w for w in self.widgets.values()
+                   if w['kind'] == kind and (label is None or w['label'] == label)]
+        return matches[index] if index < len(matches) else None
+
+    def all(self, kind):
+        return [w for w in self.widgets.values() if w['kind'] == kind]
+
+    async def rerun(self, widget=None, value=None):
+        """
+        Sends one interaction (or the initial page load) and waits for the run to finish.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        state = message.rerun_script
+        state.SetInParent()
+        if widget is not None and widget['kind'] != 'button':
+            self.values[widget['id']] = (widget['kind'], value)
+        for widget_id, (kind, current) in self.values.items():
+            entry = state.widget_states.widgets.add()
+            entry.id = widget_id
+            setattr(entry, WIDGET_TYPES[kind], current)
+        if widget is not None:
+            if widget['kind'] == 'button':
+                entry = state.widget_states.widgets.add()
+                entry.id = widget['id']
+                entry.trigger_value = True
+            if widget['fragment']:
+                state.fragment_id = widget['fragment']
+        await self.connection.send(message.SerializeToString())
+
+        while True:
+            raw = await self.connection.recv()
+            self.received_bytes += len(raw)
+            if isinstance(raw, str):
+                continue
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    self.widgets[proto.id] = {'id': proto.id, 'kind': element_type, 'label': proto.label,
+                                              'fragment': msg.delta.fragment_id}
+            elif kind == 'script_finished':
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("app.py failed to compile")
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+
+async def underwriter(url, text, seed, timings, pid=None, think_time=0.0):
+    """
+    One underwriter session; appends (interaction, seconds, bytes received,
+    server CPU seconds or None) to `timings`. Pass the server `pid` only when
+    sessions run one at a time, so CPU can be attributed to each interaction.
+    """
+    rng = random.Random(seed)
+    session = StreamlitSession(url)
+    await session.connect()
+
+    async def step(name, widget=None, value=None):
+        if think_time and name != 'page_load':
+            # Time the underwriter spends reading before the next interaction
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+        cpu = _cpu_seconds(pid) if pid else None
+        received = session.received_bytes
+        started = time.perf_counter()
+        await session.rerun(widget, value)
+        elapsed = time.perf_counter() - started
+        if cpu is not None:
+            cpu = _cpu_seconds(pid) - cpu
+        timings.append((name, elapsed, session.received_bytes - received, cpu))
+
+    try:
+        await step('page_load')
+        await step('parse', session.find('text_area'), text)
+        checklist = session.all('checkbox')
+        for widget in rng.sample(checklist, min(len(checklist), rng.randint(1, 3))):
+            await step('checklist_toggle', widget, True)
+        radios = session.all('radio')
+        for widget in radios[:2]:
+            await step('answer_flip', widget, 'No')
+        generate = session.find('button', 'Generate Remediation & Recommendation')
+        if generate is not None:
+            await step('generate', generate)
+        if radios:
+            await step('answer_flip', radios[0], 'Yes')
+    finally:
+        await session.close()
+
+
+async def run_level_async(url, pid, concurrency, sessions, seed, think_time=0.0):
+    texts = session_incidents(sessions, concurrency, seed)
+    timings = []
+    errors = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with limit:
+            try:
+                await asyncio.wait_for(underwriter(url, texts[index], f'{seed}:{index}', timings,
+                                                   pid if concurrency == 1 else None, think_time), 300)
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    return timings, errors
+
+
+def run_level(url, pid, concurrency, sessions, seed, think_time=0.0):
+    cpu_before = _cpu_seconds(pid)
+    started = time.perf_counter()
+    timings, errors = asyncio.run(run_level_async(url, pid, concurrency, sessions, seed, think_time))
+    wall = time.perf_counter() - started
+    cpu_after = _cpu_seconds(pid)
+    by_step = {}
+    for name, seconds, received, step_cpu in timings:
+        row = by_step.setdefault(name, {'latency': [], 'bytes': [], 'cpu': []})
+        row['latency'].append(seconds * 1000)
+        row['bytes'].append(received)
+        if step_cpu is not None:
+            row['cpu'].append(step_cpu * 1000)
+    cpu = (cpu_after - cpu_before) if cpu_before is not None and cpu_after is not None else None
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'errors': len(errors),
+        'interactions': len(timings),
+        'server_cpu_ms_per_interaction': round(cpu * 1000 / len(timings), 2) if cpu is not None and timings else None,
+        'interactions_per_s': round(len(timings) / wall, 2) if wall else 0.0,
+        'steps': {
+            name: {
+                'p50_ms': round(_percentile(row['latency'], 0.5), 1),
+                'p95_ms': round(_percentile(row['latency'], 0.95), 1),
+                'mean_bytes': round(sum(row['bytes']) / len(row['bytes'])),
+                'server_cpu_ms': round(sum(row['cpu']) / len(row['cpu']), 2) if row['cpu'] else None,
+            }
+            for name, row in by_step.items()
+        },
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def launch_app(app_path, env, port):
+    command = [sys.executable, '-m', 'streamlit', 'run', app_path,
+               '--server.headless', 'true', '--server.port', str(port), '--server.address', '127.0.0.1',
+               '--server.enableXsrfProtection', 'false', '--server.enableCORS', 'false',
+               '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as resp:
+                if resp.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Streamlit server did not become healthy")
+
+
+def bench_app(app_path, levels, sessions, seed, env, think_time=0.0):
+    # A fresh response cache per app so one app doesn't warm the next
+    workdir = tempfile.mkdtemp(prefix='bench-app-')
+    env = dict(env, LLM_CACHE_PATH=os.path.join(workdir, 'llm_cache.sqlite3'),
+               SEMANTIC_CACHE_PATH=os.path.join(workdir, 'semantic_index.jsonl'))
+    port = _free_port()
+    process = launch_app(app_path, env, port)
+    try:
+        url = f'ws://127.0.0.1:{port}/_stcore/stream'
+        return [run_level(url, process.pid, c, sessions, seed, think_time) for c in levels]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark app.py rerun cost under concurrent UI sessions.")
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'))
+    parser.add_argument('--compare-rev', help="also benchmark app.py as of this git revision")
+    parser.add_argument('--concurrency', default='1,8,32', help="comma-separated concurrent session counts")
+    parser.add_argument('--sessions', type=int, default=32, help="sessions per concurrency level")
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help="mean seconds a user pauses before each interaction")
+    parser.add_argument('--save', help="write results to this JSON file")
+    args = parser.parse_args(argv)
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        parser.error("needs the websockets package (benchmark-only): pip install websockets")
+
+    behavior = MockBehavior(args.latency, args.jitter, 0.0, args.seed)
+    server, base_url = start_server(behavior)
+    workdir = tempfile.mkdtemp(prefix='bench-app-')
+    env = dict(os.environ)
+    env.update(provider_env(base_url, ['openai']))
+    env.update(
+        PYTHONPATH=ROOT,
+        # Measure the LLM path itself; the shortcuts depend on what earlier sessions warmed
+        RULES_SKIP_LLM_CONFIDENCE='2',
+        SEMANTIC_CACHE_THRESHOLD='2',
+    )
+    env.pop('LLM_CACHE_BYPASS', None)
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    apps = {'current': args.app}
+    if args.compare_rev:
+        source = subprocess.run(['git', 'show', f'{args.compare_rev}:app.py'], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        apps[args.compare_rev] = os.path.join(workdir, 'app_compare.py')
+        with open(apps[args.compare_rev], 'w', encoding='utf-8') as f:
+            f.write(source)
+
+    results = {
+        'config': {'sessions': args.sessions, 'latency': args.latency, 'jitter': args.jitter, 'seed': args.seed,
+                   'think_time': args.think_time},
+        'apps': {name: bench_app(path, levels, args.sessions, args.seed, env, args.think_time)
+                 for name, path in apps.items()},
+    }
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+End-to-end pipeline benchmark against the local mock LLM server: runs the
+app.py interaction sequence (parse, pick checklist items, broker questions,
+streamed suggestions, flip an answer and regenerate) as simulated user
+sessions under increasing concurrency, with no API keys or network access.
+
+    python benchmarks/bench_pipeline.py --concurrency 1,4,16 --sessions 40 --save baseline.json
+    python benchmarks/bench_pipeline.py --concurrency 1,4,16 --sessions 40 --baseline baseline.json
+
+With --baseline, exits non-zero when p95 session latency or throughput at
+any concurrency level regresses by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import MockBehavior, provider_env, start_server  # noqa: E402
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def session_incidents(count, level, seed):
+    """
+    Returns `count` incident texts, unique per concurrency level so levels
+    don't warm each other's response cache.
+    """
+    with open(os.path.join(ROOT, 'data', 'sample_incidents.json'), 'r', encoding='utf-8') as f:
+        samples = json.load(f)
+    rng = random.Random(f'{seed}:{level}')
+    return [
+        f"{base['title']}: {base['description']} Detected by {base['detected_by']} (ticket {level}-{i})."
+        for i, base in enumerate(rng.choice(samples) for _ in range(count))
+    ]
+
+
+def simulate_session(utils, text, seed):
+    """
+    Replays one underwriter session the way app.py drives the pipeline.
+    """
+    rng = random.Random(seed)
+    parsed = utils.llm_parse_incident_and_generate_all(text)
+    checklist = parsed.get('checklist') or []
+    selected = checklist[:rng.randint(1, max(1, min(3, len(checklist))))]
+    questions = utils.assemble_broker_questions(parsed, selected)
+    if questions is None:
+        questions = utils.llm_generate_broker_questions_from_checklist(text, selected)
+    answers = ['Yes' if rng.random() < 0.6 else 'No' for _ in questions]
+    dict(utils.llm_stream_suggestions_and_remediation(text, selected, questions, answers))
+    # The underwriter changes one answer and regenerates
+    answers[0] = 'No' if answers[0] == 'Yes' else 'Yes'
+    dict(utils.llm_stream_suggestions_and_remediation(text, selected, questions, answers))
+
+
+def run_level(utils, telemetry, router, concurrency, sessions, seed):
+    telemetry.tracer = telemetry.Tracer(max_spans=sessions * 64)
+    router.reset_stats()
+    texts = session_incidents(sessions, concurrency, seed)
+    latencies = []
+    errors = []
+
+    def one(index):
+        session_id = f'bench-{concurrency}-{index}'
+        telemetry.set_session(session_id)
+        start = time.perf_counter()
+        try:
+            simulate_session(utils, texts[index], f'{seed}:{index}')
+        except Exception as e:
+            errors.append(type(e).__name__)
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(sessions)))
+    wall = time.perf_counter() - start
+
+    calls = sum(1 for s in telemetry.tracer.spans if s['kind'] == 'provider')
+    stages = {row['stage']: row['p95_ms'] for row in telemetry.tracer.summary()
+              if row['stage'] in ('parse', 'broker_questions', 'suggestions')}
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'errors': len(errors),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+        'throughput_sessions_per_s': round(len(latencies) / wall, 3) if wall else 0.0,
+        'calls_per_session': round(calls / sessions, 2),
+        'stage_p95_ms': stages,
+        'router_mix': router.mix(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of regressions of `results` against a saved `baseline` run.
+    """
+    previous = {level['concurrency']: level for level in baseline.get('levels', [])}
+    regressions = []
+    for level in results['levels']:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        if before['p95_ms'] and level['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"c={level['concurrency']}: p95 {before['p95_ms']}ms -> {level['p95_ms']}ms")
+        if level['throughput_sessions_per_s'] < before['throughput_sessions_per_s'] * (1 - tolerance):
+            regressions.append(f"c={level['concurrency']}: throughput {before['throughput_sessions_per_s']}"
+                               f" -> {level['throughput_sessions_per_s']} sessions/s")
+        if level['calls_per_session'] > before['calls_per_session']:
+            regressions.append(f"c={level['concurrency']}: calls/session {before['calls_per_session']}"
+                               f" -> {level['calls_per_session']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local mock LLM server.")
+    parser.add_argument('--concurrency', default='1,4,16', help="comma-separated concurrent session counts")
+    parser.add_argument('--sessions', type=int, default=40, help="sessions per concurrency level")
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--providers', default='openai', help="providers to point at the mock server")
+    parser.add_argument('--fast-paths', action='store_true',
+                        help="keep the rule-engine and semantic-cache shortcuts enabled")
+    parser.add_argument('--no-router', action='store_true', help="send every call to the default models")
+    parser.add_argument('--save', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a previously saved results file")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    behavior = MockBehavior(args.latency, args.jitter, args.error_rate, args.seed)
+    server, base_url = start_server(behavior)
+    workdir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    os.environ.update(provider_env(base_url, args.providers.split(',')))
+    os.environ.update(
+        LLM_CACHE_PATH=os.path.join(workdir, 'llm_cache.sqlite3'),
+        SEMANTIC_CACHE_PATH=os.path.join(workdir, 'semantic_index.jsonl'),
+    )
+    os.environ.pop('LLM_CACHE_BYPASS', None)
+    if not args.fast_paths:
+        # Measure the LLM path itself; the shortcuts depend on what earlier sessions warmed
+        os.environ.update(RULES_SKIP_LLM_CONFIDENCE='2', SEMANTIC_CACHE_THRESHOLD='2')
+    if args.no_router:
+        os.environ['LLM_ROUTER'] = 'off'
+
+    # Imported after the environment points every provider at the mock server
+    import telemetry
+    import utils
+    from router import get_router
+
+    levels = [run_level(utils, telemetry, get_router(), int(c), args.sessions, args.seed)
+              for c in args.concurrency.split(',')]
+    server.shutdown()
+    results = {
+        'config': {
+            'sessions': args.sessions, 'latency': args.latency, 'jitter': args.jitter,
+            'error_rate': args.error_rate, 'seed': args.seed, 'providers': args.providers,
+            'fast_paths': args.fast_paths, 'router': not args.no_router,
+        },
+        'mock_requests': behavior.requests,
+        'mock_errors': behavior.errors,
+        'levels': levels,
+    }
+    print(json.dumps(results, indent=2))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
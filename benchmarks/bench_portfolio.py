@@ -0,0 +1,85 @@
+"""
+Portfolio engine throughput on a large synthetic book: loading incident
+records, bulk broker-answer modifiers, aggregation and budget optimization.
+
+    python benchmarks/bench_portfolio.py --incidents 300000 --insureds 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from portfolio import Portfolio  # noqa: E402
+
+
+def synthetic_records(count, insureds, seed=7):
+    with open(os.path.join(ROOT, 'data', 'sample_incidents.json'), 'r', encoding='utf-8') as f:
+        samples = json.load(f)
+    rng = random.Random(seed)
+    for i in range(count):
+        base = rng.choice(samples)
+        yield {
+            'id': str(i),
+            'insured_id': f"insured-{rng.randrange(insureds)}",
+            'risk_level': base['risk_level'],
+            'risk_contribution_score': base['risk_contribution_score'] * rng.uniform(0.5, 1.5),
+            'remediation_cost': int(base['remediation_cost'] * rng.uniform(0.5, 2.0)),
+            'asset_type': base['asset_type'],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=300000)
+    parser.add_argument('--insureds', type=int, default=5000)
+    parser.add_argument('--budget', type=float, default=250000)
+    args = parser.parse_args(argv)
+
+    records = list(synthetic_records(args.incidents, args.insureds))
+    start = time.perf_counter()
+    portfolio = Portfolio.from_records(records)
+    load_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(7)
+    rows = np.arange(len(portfolio))
+    start = time.perf_counter()
+    portfolio.apply_answer_counts(rows, rng.integers(0, 2, len(rows)), rng.integers(0, 3, len(rows)))
+    modifiers_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    book = portfolio.book_summary()
+    insureds = portfolio.by_insured()
+    aggregate_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    plan = portfolio.optimize(args.budget)
+    optimize_ms = (time.perf_counter() - start) * 1000
+
+    small = Portfolio.from_records(records[:200])
+    start = time.perf_counter()
+    exact = small.optimize(2000, exact=True)
+    exact_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        'incidents': len(portfolio),
+        'insureds': len(insureds),
+        'load_records_ms': round(load_s * 1000, 1),
+        'answer_modifiers_ms': round(modifiers_ms, 2),
+        'aggregate_ms': round(aggregate_ms, 2),
+        'optimize_ms': round(optimize_ms, 2),
+        'optimize_method': plan.method,
+        'fixes_selected': len(plan.ids),
+        'risk_reduction_share': round(plan.risk_reduction / book['gross_risk'], 4),
+        'exact_200_incidents_ms': round(exact_ms, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Rule-engine throughput on a large synthetic incident batch.
+
+    python benchmarks/bench_rules.py --incidents 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rules import RuleSet, fast_path  # noqa: E402
+
+FILLER = [
+    "detected by external scan", "on the finance subnet", "reported by the MSP",
+    "during quarterly review", "affecting 12 hosts", "in the staging environment",
+    "flagged by the SOC", "no customer data confirmed", "host srv-web-04",
+]
+
+
+def synthetic_incidents(count, seed=7):
+    with open(os.path.join(ROOT, 'data', 'sample_incidents.json'), 'r', encoding='utf-8') as f:
+        samples = json.load(f)
+    rng = random.Random(seed)
+    for _ in range(count):
+        base = rng.choice(samples)
+        extra = ' '.join(rng.sample(FILLER, 3))
+        yield f"{base['title']}: {base['description']} {extra}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    texts = list(synthetic_incidents(args.incidents))
+    start = time.perf_counter()
+    ruleset = RuleSet()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for text in texts:
+        ruleset.classify(text)
+    classify_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    skipped = sum(1 for text in texts if fast_path(text) is not None)
+    triage_s = time.perf_counter() - start
+
+    print(json.dumps({
+        'incidents': len(texts),
+        'compile_ms': round(compile_ms, 3),
+        'classify_per_sec': round(len(texts) / classify_s),
+        'classify_us_per_incident': round(classify_s / len(texts) * 1e6, 2),
+        'fast_path_per_sec': round(len(texts) / triage_s),
+        'llm_skip_rate': round(skipped / len(texts), 4),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Cold-start cost of `import utils`: wall time, peak resident memory and
+which provider SDKs got imported, measured in fresh interpreters.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import utils
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+sdks = [m for m in ('streamlit', 'openai', 'groq', 'cohere', 'google.generativeai') if m in sys.modules]
+print(json.dumps({'import_ms': elapsed * 1000, 'max_rss_mb': rss_kb / 1024, 'sdks_loaded': sdks}))
+"""
+
+BASELINE_PROBE = r"""
+import json, resource, sys
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+print(json.dumps({'max_rss_mb': rss_kb / 1024}))
+"""
+
+
+def probe(code):
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and memory of utils.")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    interpreter_mb = probe(BASELINE_PROBE)['max_rss_mb']
+    samples = [probe(PROBE) for _ in range(args.runs)]
+    import_ms = sorted(s['import_ms'] for s in samples)
+    rss = [s['max_rss_mb'] for s in samples]
+    print(json.dumps({
+        'runs': args.runs,
+        'import_ms_median': round(statistics.median(import_ms), 2),
+        'import_ms_max': round(import_ms[-1], 2),
+        'max_rss_mb_median': round(statistics.median(rss), 2),
+        'rss_over_bare_interpreter_mb': round(statistics.median(rss) - interpreter_mb, 2),
+        'sdks_loaded': samples[-1]['sdks_loaded'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Local stand-in for the OpenAI, Groq, Cohere and Gemini HTTP APIs, with
+configurable latency, jitter, error rate and canned responses. Latency and
+injected errors are drawn from a seed and the request body, so a given
+workload sees the same delays regardless of thread scheduling.
+
+    python benchmarks/mock_llm_server.py --port 8765 --latency 0.4 --jitter 0.1 --error-rate 0.02
+    OPENAI_API_KEY=mock OPENAI_API_BASE=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# (prompt substring, response) pairs; the first match wins
+DEFAULT_RESPONSES = [
+    ("Parse the above incident", json.dumps({
+        'checklist': ["Confirm asset inventory", "Verify patch status for affected systems",
+                      "Check MFA enforcement for all admin accounts"],
+        'broker_questions': ["Is MFA enforced for all admin accounts?", "Are all systems patched?"],
+        'risk_mitigation': ["Restrict public exposure", "Enforce MFA", "Patch affected systems"],
+        'remediation': "Remove public access, rotate credentials and patch the affected systems.",
+        'recommendation': "Request fix",
+        'confidence': 0.82,
+        'broker_summary': "Exposure found on an internet-facing asset. Fix requested before binding.",
+        'explanation': "Missing controls on an internet-facing asset raise breach likelihood.",
+        'checklist_questions': {
+            "Confirm asset inventory": ["Is there an up-to-date inventory of affected assets?"],
+            "Verify patch status for affected systems": ["Are all affected systems patched?"],
+            "Check MFA enforcement for all admin accounts": ["Is MFA enforced for all admin accounts?"],
+        },
+    })),
+    ("yes/no broker questions", json.dumps([
+        "Is MFA enforced for all admin accounts?",
+        "Are all affected systems patched?",
+        "Is the asset still reachable from the internet?",
+    ])),
+    ("Based on the above, generate", json.dumps({
+        'risk_mitigation': ["Restrict public exposure", "Enforce MFA", "Monitor for suspicious logins"],
+        'remediation': "Close the exposure, rotate credentials and confirm patch levels.",
+        'recommendation': "Request fix",
+        'confidence': 0.78,
+        'broker_summary': "Controls partially confirmed. Remaining gaps must be fixed before binding.",
+        'explanation': "Broker answers confirm some controls; open gaps keep the risk elevated.",
+    })),
+    ("Format:\nRemediation:", (
+        "Remediation: Restrict access to the affected service and apply vendor patches.\n"
+        "Why: The exposure is reachable from the internet and actively targeted.\n"
+        "Recommended Action: Request fix\n"
+        "Confidence: 0.8"
+    )),
+    ("", "- Enforce MFA for remote access\n- Patch internet-facing services\n- Enable centralized logging"),
+]
+
+
+def estimate_tokens(text):
+    return max(1, len(text or '') // 4)
+
+
+class MockBehavior:
+    """
+    Latency, jitter, error injection and canned responses shared by all handlers.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.05, error_rate=0.0, seed=7, responses=None, stream_chunks=12):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.responses = list(responses or []) + DEFAULT_RESPONSES
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        self.errors = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def draw(self, body):
+        """
+        Returns (delay_seconds, fail) for a request, deterministic per
+        (seed, body, how many times this body has been seen).
+        """
+        with self._lock:
+            self.requests += 1
+            occurrence = self._seen.get(body, 0)
+            self._seen[body] = occurrence + 1
+        rng = random.Random(zlib.crc32(f'{self.seed}:{occurrence}:'.encode('utf-8') + body))
+        delay = max(0.0, rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+        fail = rng.random() < self.error_rate
+        if fail:
+            with self._lock:
+                self.errors += 1
+        return delay, fail
+
+    def respond(self, prompt):
+        for needle, response in self.responses:
+            if needle in prompt:
+                return response
+        return ''
+
+
+def _openai_prompt(payload):
+    return '\n'.join(m.get('content', '') for m in payload.get('messages', []) if isinstance(m, dict))
+
+
+def _gemini_prompt(payload):
+    return '\n'.join(part.get('text', '') for content in payload.get('contents', [])
+                     for part in content.get('parts', []))
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    behavior = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'requests': self.behavior.requests, 'errors': self.behavior.errors})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON body'}})
+            return
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/chat/completions'):
+            prompt, vendor = _openai_prompt(payload), 'openai'
+        elif path.endswith('/generate'):
+            prompt, vendor = payload.get('prompt', ''), 'cohere'
+        elif re.search(r'/models/[^/]+:(generateContent|streamGenerateContent)$', path):
+            prompt, vendor = _gemini_prompt(payload), 'gemini'
+        else:
+            self._send_json(404, {'error': {'message': f'unknown endpoint {path}'}})
+            return
+
+        delay, fail = self.behavior.draw(raw)
+        text = self.behavior.respond(prompt)
+        if fail:
+            time.sleep(delay / 2)
+            self._send_json(503, {'error': {'message': 'mock overloaded', 'type': 'server_error'}},
+                            {'Retry-After': '1'})
+            return
+        usage = (estimate_tokens(prompt), estimate_tokens(text))
+        if vendor == 'openai' and payload.get('stream'):
+            self._stream_openai(payload, text, delay)
+            return
+        time.sleep(delay)
+        if vendor == 'openai':
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'mock'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': usage[0], 'completion_tokens': usage[1], 'total_tokens': sum(usage)},
+            })
+        elif vendor == 'cohere':
+            self._send_json(200, {
+                'id': 'mock',
+                'generations': [{'id': 'mock-0', 'text': text}],
+                'meta': {'billed_units': {'input_tokens': usage[0], 'output_tokens': usage[1]}},
+            })
+        else:
+            self._send_json(200, {
+                'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'},
+                                'finishReason': 'STOP', 'index': 0}],
+                'usageMetadata': {'promptTokenCount': usage[0], 'candidatesTokenCount': usage[1],
+                                  'totalTokenCount': sum(usage)},
+            })
+
+    def _stream_openai(self, payload, text, delay):
+        # Half the delay is time to first token, the rest is spread over the chunks
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        time.sleep(delay / 2)
+        chunks = max(1, self.behavior.stream_chunks)
+        size = max(1, -(-len(text) // chunks))
+        for i in range(0, len(text), size):
+            event = {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': payload.get('model', 'mock'),
+                'choices': [{'index': 0, 'delta': {'content': text[i:i + size]}, 'finish_reason': None}],
+            }
+            self.wfile.write(b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n')
+            self.wfile.flush()
+            time.sleep(delay / 2 / chunks)
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def start_server(behavior, host='127.0.0.1', port=0):
+    """
+    Starts the mock server on a background thread and returns (server, base_url).
+    Port 0 picks a free port.
+    """
+    handler = type('BoundMockLLMHandler', (MockLLMHandler,), {'behavior': behavior})
+    server = MockLLMServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='mock-llm-server', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def provider_env(base_url, providers=('openai',)):
+    """
+    Returns the environment variables pointing the given providers at the mock server.
+    """
+    env = {}
+    if 'openai' in providers:
+        env.update(OPENAI_API_KEY='mock', OPENAI_API_BASE=base_url + '/v1')
+    if 'groq' in providers:
+        env.update(GROQ_API_KEY='mock', GROQ_BASE_URL=base_url)
+    if 'gemini' in providers:
+        env.update(GEMINI_API_KEY='mock', GEMINI_API_BASE=base_url)
+    if 'cohere' in providers:
+        env.update(COHERE_API_KEY='mock', COHERE_BASE_URL=base_url)
+    return env
+
+
+def load_responses(path):
+    """
+    Reads canned responses from a JSON object mapping prompt substrings to replies.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    return [(needle, reply if isinstance(reply, str) else json.dumps(reply)) for needle, reply in mapping.items()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve mock LLM provider endpoints locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3, help="mean response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="latency standard deviation in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--responses', help="JSON file mapping prompt substrings to canned replies")
+    args = parser.parse_args(argv)
+
+    behavior = MockBehavior(args.latency, args.jitter, args.error_rate, args.seed,
+                            load_responses(args.responses) if args.responses else None)
+    server, base_url = start_server(behavior, args.host, args.port)
+    print(f"Mock LLM server on {base_url}")
+    for name, value in provider_env(base_url, ('openai', 'groq', 'gemini', 'cohere')).items():
+        print(f"  {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
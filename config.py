@@ -0,0 +1,63 @@
+import os
+import sys
+
+# Broker-answer risk modifiers: any 'No' answer raises an incident's risk,
+# all 'Yes' answers lower it (utils.adjust_risk_and_suggestions, portfolio.py)
+ANY_NO_MODIFIER = 1.2
+ALL_YES_MODIFIER = 0.8
+
+SECRET_KEYS = ["OPENAI_API_KEY", "GEMINI_API_KEY", "COHERE_API_KEY", "GROQ_API_KEY"]
+
+SECRETS_PATHS = [
+    os.path.join('.streamlit', 'secrets.toml'),
+    os.path.join(os.path.expanduser('~'), '.streamlit', 'secrets.toml'),
+]
+
+
+def _read_toml(path):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            return {}
+    try:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_secrets(keys=SECRET_KEYS):
+    """
+    Copies API keys into os.environ without overriding variables already set.
+    Sources, in order: st.secrets when running inside Streamlit, then
+    .streamlit/secrets.toml (project, then home), then a .env file if
+    python-dotenv is installed. Streamlit is never imported here, so batch
+    workers and the HTTP API start without it.
+    """
+    missing = [key for key in keys if not os.getenv(key)]
+    if not missing:
+        return
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        try:
+            for key in missing:
+                if key in st.secrets:
+                    os.environ[key] = st.secrets[key]
+        except Exception:
+            # No secrets file configured; st.secrets raises on access
+            pass
+    for path in SECRETS_PATHS:
+        if not os.path.exists(path):
+            continue
+        secrets = _read_toml(path)
+        for key in missing:
+            if not os.getenv(key) and isinstance(secrets.get(key), str):
+                os.environ[key] = secrets[key]
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(override=False)
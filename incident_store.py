@@ -0,0 +1,304 @@
+"""
+Indexed incident store. Scanner histories are imported into SQLite once
+(streamed, in batches) and then filtered through indexes on risk_level,
+asset_type, detected_by and date_detected instead of re-parsing a JSON file.
+LLM results are stored next to their incident, keyed by pipeline stage.
+
+    python incident_store.py import data/sample_incidents.json
+    python incident_store.py query --risk-level High --asset-type Server --limit 20
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_STORE_PATH = os.path.join('data', 'incidents.sqlite3')
+
+FIELDS = ['id', 'title', 'description', 'risk_level', 'risk_contribution_score', 'remediation_cost',
+          'recommended_action', 'confidence_score', 'asset_type', 'business_impact', 'detected_by',
+          'date_detected', 'insured_id']
+_FIELD_SET = frozenset(FIELDS)
+INDEXED = ['risk_level', 'asset_type', 'detected_by', 'date_detected', 'insured_id']
+
+_IncidentBase = namedtuple('Incident', FIELDS + ['extra'])
+
+
+class Incident(_IncidentBase):
+    """
+    Compact incident record. Fields outside the standard schema live in `extra`.
+    get() mirrors dict.get so records can be passed where incident dicts are read.
+    """
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        if key in FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return json.loads(self.extra).get(key, default) if self.extra else default
+
+    def to_dict(self):
+        """
+        Returns the incident as the dict shape utils and batch expect.
+        """
+        data = {k: v for k, v in zip(FIELDS, self) if v is not None}
+        if self.extra:
+            data.update(json.loads(self.extra))
+        return data
+
+
+def incident_id(incident):
+    """
+    Returns the incident's id as a string. Incidents without one get a stable
+    id derived from their content, so distinct id-less incidents don't collapse
+    into one row and re-imports or resumed batches find the same id again.
+    """
+    value = incident.get('id')
+    if value is not None and str(value).strip():
+        return str(value)
+    content = json.dumps({k: v for k, v in incident.items() if k != 'id'}, sort_keys=True,
+                         ensure_ascii=False, default=str)
+    return 'sha1-' + hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+def _row(incident):
+    get = incident.get
+    values = [get(field) for field in FIELDS]
+    values[0] = incident_id(incident)
+    extra = incident.keys() - _FIELD_SET
+    values.append(json.dumps({k: incident[k] for k in extra}, ensure_ascii=False) if extra else None)
+    return values
+
+
+class IncidentStore:
+    """
+    SQLite-backed incident table plus an llm_results table keyed by
+    (incident_id, stage). Safe to share across threads; WAL mode keeps
+    readers cheap while a batch job writes results.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('INCIDENT_STORE_PATH', DEFAULT_STORE_PATH)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        columns = ', '.join(f'{f} REAL' if f in ('risk_contribution_score', 'remediation_cost', 'confidence_score')
+                            else f'{f} TEXT' for f in FIELDS[1:])
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS incidents (id TEXT PRIMARY KEY, {columns}, extra TEXT)')
+        self._create_indexes()
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS llm_results ('
+            ' incident_id TEXT NOT NULL,'
+            ' stage TEXT NOT NULL,'
+            ' result TEXT NOT NULL,'
+            ' model TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' PRIMARY KEY (incident_id, stage)) WITHOUT ROWID'
+        )
+        self._conn.commit()
+
+    def _create_indexes(self):
+        for field in INDEXED:
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS incidents_{field} ON incidents ({field})')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_many(self, incidents, batch_size=5000):
+        """
+        Upserts incidents from any iterable in batches; returns how many were
+        written. Loading into an empty store builds the secondary indexes once
+        at the end instead of maintaining them row by row.
+        """
+        sql = (f'INSERT OR REPLACE INTO incidents ({", ".join(FIELDS)}, extra)'
+               f' VALUES ({", ".join("?" * (len(FIELDS) + 1))})')
+        bulk = self.count() == 0
+        if bulk:
+            with self._lock:
+                for field in INDEXED:
+                    self._conn.execute(f'DROP INDEX IF EXISTS incidents_{field}')
+        written = 0
+        batch = []
+        try:
+            for incident in incidents:
+                batch.append(_row(incident))
+                if len(batch) >= batch_size:
+                    written += self._write(sql, batch)
+                    batch = []
+            if batch:
+                written += self._write(sql, batch)
+        finally:
+            if bulk:
+                with self._lock:
+                    self._create_indexes()
+                    self._conn.commit()
+        return written
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+        return len(rows)
+
+    def import_file(self, path, batch_size=5000):
+        """
+        Streams a JSON array or JSONL incident file into the store.
+        """
+        from batch import iter_incidents
+        return self.add_many(iter_incidents(path), batch_size)
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for field in INDEXED:
+            value = filters.get(field)
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f'{field} IN ({", ".join("?" * len(value))})')
+                params.extend(value)
+            else:
+                clauses.append(f'{field} = ?')
+                params.append(value)
+        if filters.get('date_from'):
+            clauses.append('date_detected >= ?')
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            clauses.append('date_detected <= ?')
+            params.append(filters['date_to'])
+        unknown = set(filters) - set(INDEXED) - {'date_from', 'date_to'}
+        if unknown:
+            raise ValueError(f"unknown filters: {', '.join(sorted(unknown))}")
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, limit=None, offset=0, order_by='date_detected', fetch_size=1000, **filters):
+        """
+        Yields Incident records matching the filters (risk_level, asset_type,
+        detected_by, insured_id, date_detected; each a value or a list of values;
+        plus date_from/date_to), fetched `fetch_size` rows at a time.
+        """
+        if order_by not in FIELDS:
+            raise ValueError(f"cannot order by {order_by}")
+        where, params = self._where(filters)
+        sql = f'SELECT {", ".join(FIELDS)}, extra FROM incidents{where} ORDER BY {order_by}, id'
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [int(limit), int(offset)]
+        # A separate cursor per iterator so concurrent scans don't interfere
+        cursor = self._conn.cursor()
+        with self._lock:
+            cursor.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield Incident._make(row)
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM incidents{where}', params).fetchone()[0]
+
+    def get(self, incident_id):
+        with self._lock:
+            row = self._conn.execute(f'SELECT {", ".join(FIELDS)}, extra FROM incidents WHERE id = ?',
+                                     (str(incident_id),)).fetchone()
+        return Incident._make(row) if row else None
+
+    def facets(self, field):
+        """
+        Returns {value: count} for an indexed field, read from its index.
+        """
+        if field not in INDEXED:
+            raise ValueError(f"{field} is not indexed")
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {field}, COUNT(*) FROM incidents GROUP BY {field}').fetchall()
+        return dict(rows)
+
+    def save_result(self, incident_id, stage, result, model=None):
+        """
+        Stores an LLM (or rule) result for one incident and pipeline stage.
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_results (incident_id, stage, result, model, created_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (str(incident_id), stage, json.dumps(result, ensure_ascii=False), model, time.time())
+            )
+            self._conn.commit()
+
+    def get_result(self, incident_id, stage):
+        with self._lock:
+            row = self._conn.execute('SELECT result FROM llm_results WHERE incident_id = ? AND stage = ?',
+                                     (str(incident_id), stage)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def results_for(self, incident_id):
+        """
+        Returns {stage: result} for every stored result of an incident.
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT stage, result FROM llm_results WHERE incident_id = ?',
+                                      (str(incident_id),)).fetchall()
+        return {stage: json.loads(result) for stage, result in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Returns the process-wide IncidentStore.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IncidentStore()
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import and query the indexed incident store.")
+    parser.add_argument('--store', default=None, help=f"SQLite path (default {DEFAULT_STORE_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser('import', help="stream a JSON array or JSONL file into the store")
+    importer.add_argument('input')
+    importer.add_argument('--batch-size', type=int, default=5000)
+    query = commands.add_parser('query', help="print matching incidents as JSONL")
+    for field in INDEXED:
+        query.add_argument('--' + field.replace('_', '-'), action='append')
+    query.add_argument('--date-from')
+    query.add_argument('--date-to')
+    query.add_argument('--limit', type=int)
+    query.add_argument('--with-results', action='store_true', help="include stored LLM results")
+    commands.add_parser('stats', help="incident counts per indexed field")
+    args = parser.parse_args(argv)
+
+    store = IncidentStore(args.store)
+    if args.command == 'import':
+        start = time.perf_counter()
+        written = store.import_file(args.input, args.batch_size)
+        print(json.dumps({'imported': written, 'seconds': round(time.perf_counter() - start, 3)}))
+    elif args.command == 'query':
+        filters = {field: getattr(args, field) for field in INDEXED if getattr(args, field)}
+        for incident in store.query(limit=args.limit, date_from=args.date_from, date_to=args.date_to, **filters):
+            record = incident.to_dict()
+            if args.with_results:
+                record['llm_results'] = store.results_for(incident.id)
+            print(json.dumps(record, ensure_ascii=False))
+    else:
+        print(json.dumps({'incidents': store.count(), **{f: store.facets(f) for f in INDEXED[:3]}}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
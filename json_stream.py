@@ -0,0 +1,91 @@
+from structured import StructuredOutputError, loads_tolerant
+
+
+def _parse_member(member):
+    """
+    Parses a single `"key": value` member with the tolerant structured-output
+    parser, so single quotes and apostrophes don't drop a field.
+    """
+    try:
+        value = loads_tolerant('{' + member.strip().rstrip(',') + '}', dict)
+    except StructuredOutputError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+class IncrementalJSONParser:
+    """
+    Consumes a JSON object as streamed text chunks and yields each top-level
+    (key, value) pair as soon as its value is complete, without waiting for
+    the closing brace. Anything before the opening brace (code fences, prose)
+    is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.quote = None
+        self.escape = False
+        self.member_start = None
+        self.done = False
+        self.fields = {}
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of text and returns the list of newly completed (key, value) pairs.
+        """
+        completed = []
+        if self.done or not chunk:
+            return completed
+        self.buffer += chunk
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+            if self.quote:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == self.quote:
+                    if ch == "'":
+                        # An apostrophe only closes the string before structure
+                        # ("customer's" stays open); wait for the next character.
+                        rest = self.buffer[self.pos + 1:].lstrip()
+                        if not rest:
+                            break
+                        if rest[0] in ',:}]':
+                            self.quote = None
+                    else:
+                        self.quote = None
+            elif ch in ('"', "'"):
+                if self.depth > 0:
+                    self.quote = ch
+            elif ch in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    if ch != '{':
+                        self.depth = 0
+                    else:
+                        self.member_start = self.pos + 1
+            elif ch in '}]':
+                if self.depth > 0:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self._complete_member(self.pos, completed)
+                        self.done = True
+            elif ch == ',' and self.depth == 1:
+                self._complete_member(self.pos, completed)
+                self.member_start = self.pos + 1
+            self.pos += 1
+        return completed
+
+    def _complete_member(self, end, completed):
+        member = self.buffer[self.member_start:end]
+        if not member.strip():
+            return
+        parsed = _parse_member(member)
+        if not parsed:
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'llm_cache.sqlite3')
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_prompt(prompt):
+    """
+    Collapses runs of whitespace so cosmetic differences don't defeat the cache.
+    """
+    return ' '.join(str(prompt).split())
+
+
+def cache_key(provider, model, prompt):
+    """
+    Returns the content address for a (provider, model, normalized prompt) triple.
+    """
+    payload = json.dumps([provider, model, normalize_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _env_flag(name):
+    return os.getenv(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class LLMCache:
+    """
+    SQLite-backed LLM response cache with LRU eviction and a TTL.
+    The database file is shared by every Streamlit session and worker process
+    pointing at the same path; WAL mode keeps concurrent readers cheap.
+    """
+
+    def __init__(self, path=None, max_entries=None, ttl=None, bypass=None):
+        self.path = path or os.getenv('LLM_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.getenv('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self.ttl = float(ttl if ttl is not None
+                         else os.getenv('LLM_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        self.bypass = _env_flag('LLM_CACHE_BYPASS') if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' provider TEXT NOT NULL,'
+                ' model TEXT NOT NULL,'
+                ' response TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, provider, model, prompt, bypass=False):
+        """
+        Returns the cached response text, or None on a miss, expiry or bypass.
+        """
+        found = self.get_first([(provider, model)], prompt, bypass)
+        return found[2] if found is not None else None
+
+    def get_first(self, candidates, prompt, bypass=False):
+        """
+        Looks up `prompt` under each (provider, model) pair in preference order
+        and returns (provider, model, text) for the first live entry, or None.
+        One query, counted as a single hit or miss however many pairs are checked.
+        """
+        if bypass or self.bypass:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        keys = {cache_key(provider, model, prompt): (provider, model) for provider, model in candidates}
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            rows = dict((key, (response, created_at)) for key, response, created_at in conn.execute(
+                f'SELECT key, response, created_at FROM llm_cache WHERE key IN ({", ".join("?" * len(keys))})',
+                list(keys)
+            ))
+            expired = [key for key, (_, created_at) in rows.items() if self.ttl > 0 and now - created_at > self.ttl]
+            if expired:
+                conn.executemany('DELETE FROM llm_cache WHERE key = ?', [(key,) for key in expired])
+                conn.commit()
+            for key, (provider, model) in keys.items():
+                if key in rows and key not in expired:
+                    conn.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+                    conn.commit()
+                    self.hits += 1
+                    return provider, model, rows[key][0]
+            self.misses += 1
+            return None
+
+    def set(self, provider, model, prompt, response):
+        """
+        Stores a response and evicts least-recently-used entries beyond max_entries.
+        """
+        if not response:
+            return
+        key = cache_key(provider, model, prompt)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, provider, model, response, created_at, last_access)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, provider, model, response, now, now)
+            )
+            if self.max_entries > 0:
+                (count,) = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        'DELETE FROM llm_cache WHERE key IN ('
+                        ' SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)',
+                        (overflow,)
+                    )
+                    self.evictions += overflow
+            conn.commit()
+
+    def delete(self, provider, model, prompt):
+        key = cache_key(provider, model, prompt)
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM llm_cache')
+            conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process plus the current entry count.
+        """
+        with self._lock:
+            (entries,) = self._connection().execute('SELECT COUNT(*) FROM llm_cache').fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'entries': entries,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the process-wide LLMCache instance.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,303 @@
+"""
+Columnar portfolio risk engine. Incidents are loaded into NumPy arrays so
+broker-answer modifiers, net risk after remediation and per-insured totals
+are computed in bulk, and a knapsack optimizer picks the fixes that remove
+the most risk for a remediation budget.
+
+    python portfolio.py data/sample_incidents.json --budget 1500
+    python portfolio.py data/incidents.sqlite3 --budget 1500 --where asset_type=Server
+"""
+import argparse
+import json
+import math
+from collections import namedtuple
+
+from config import ALL_YES_MODIFIER, ANY_NO_MODIFIER
+from incident_store import incident_id
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+# Used when an incident has no risk_contribution_score
+DEFAULT_SCORES = {'Low': 5.0, 'Medium': 15.0, 'High': 25.0, 'Critical': 40.0}
+UNASSIGNED = 'unassigned'
+
+# Exact DP is used when candidates x budget units stays under this many cells
+EXACT_MAX_CELLS = 4_000_000
+
+Plan = namedtuple('Plan', ['ids', 'indices', 'cost', 'risk_reduction', 'method'])
+
+
+def answer_modifiers(no_counts, yes_counts):
+    """
+    Vectorized risk modifier per incident: any 'No' answer raises risk, all
+    'Yes' answers lower it, no answers leave it unchanged.
+    """
+    no_counts = np.asarray(no_counts)
+    yes_counts = np.asarray(yes_counts)
+    return np.where(no_counts > 0, ANY_NO_MODIFIER,
+                    np.where(yes_counts > 0, ALL_YES_MODIFIER, 1.0))
+
+
+def _codes(values):
+    """
+    Returns (int32 codes, labels) for a sequence of hashable values.
+    """
+    labels = {}
+    codes = np.fromiter((labels.setdefault(v, len(labels)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(labels)
+
+
+class Portfolio:
+    """
+    Incidents as parallel arrays: risk score, remediation cost, risk level,
+    insured and asset-type codes, the broker-answer modifier and a
+    remediated flag.
+    """
+
+    def __init__(self, ids, insured, risk_level, score, cost, asset_type=None, residual=0.1):
+        count = len(ids)
+        self.ids = np.asarray(ids, dtype=object)
+        self.id_index = None
+        self.insured_codes, self.insured_names = _codes(list(insured))
+        self.risk_level = np.asarray(risk_level, dtype=np.int8)
+        self.score = np.asarray(score, dtype=np.float64)
+        self.cost = np.asarray(cost, dtype=np.float64)
+        self.asset_codes, self.asset_names = _codes(list(asset_type if asset_type is not None else [''] * count))
+        self.modifier = np.ones(count, dtype=np.float64)
+        self.remediated = np.zeros(count, dtype=bool)
+        # Fraction of an incident's risk left after its fix is applied
+        self.residual = residual
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records, residual=0.1):
+        """
+        Builds a portfolio from incident dicts (any iterable, consumed once).
+        Incidents are grouped by `insured_id` (or `insured`) when present;
+        incidents without an id get the same content-derived id as in the store.
+        """
+        ids, insured, levels, scores, costs, assets = [], [], [], [], [], []
+        level_index = {}
+        for i, name in enumerate(RISK_LEVELS):
+            level_index[name] = level_index[name.lower()] = level_index[name.upper()] = i
+        for record in records:
+            level = record.get('risk_level') or 'Medium'
+            score = record.get('risk_contribution_score')
+            owner = record.get('insured_id') or record.get('insured')
+            ids.append(incident_id(record))
+            insured.append(str(owner) if owner else UNASSIGNED)
+            levels.append(level_index.get(level, 1))
+            scores.append(float(score) if score is not None else DEFAULT_SCORES.get(level, 15.0))
+            costs.append(float(record.get('remediation_cost') or 0.0))
+            assets.append(record.get('asset_type') or '')
+        return cls(ids, insured, levels, scores, costs, assets, residual)
+
+    def index_of(self, incident_ids):
+        """
+        Returns row indices for incident ids (KeyError for unknown ids).
+        """
+        if self.id_index is None:
+            self.id_index = {key: i for i, key in enumerate(self.ids)}
+        return np.fromiter((self.id_index[str(i)] for i in incident_ids), dtype=np.int64, count=len(incident_ids))
+
+    def apply_answer_counts(self, rows, no_counts, yes_counts):
+        """
+        Sets the modifier for `rows` from per-incident counts of 'No' and 'Yes' answers.
+        """
+        self.modifier[rows] = answer_modifiers(no_counts, yes_counts)
+
+    def apply_answers(self, answers):
+        """
+        Applies broker answers given as {incident_id: ['Yes', 'No', ...]}.
+        """
+        rows = self.index_of(list(answers))
+        no_counts = np.fromiter((sum(a == 'No' for a in v) for v in answers.values()), dtype=np.int32, count=len(rows))
+        yes_counts = np.fromiter((sum(a == 'Yes' for a in v) for v in answers.values()), dtype=np.int32, count=len(rows))
+        self.apply_answer_counts(rows, no_counts, yes_counts)
+
+    def gross_risk(self):
+        """
+        Risk per incident after broker-answer modifiers, before remediation.
+        """
+        return self.score * self.modifier
+
+    def net_risk(self):
+        """
+        Risk per incident after modifiers and any remediation applied.
+        """
+        return self.gross_risk() * np.where(self.remediated, self.residual, 1.0)
+
+    def by_insured(self):
+        """
+        Returns {insured: {incidents, gross_risk, net_risk, open_remediation_cost}}.
+        """
+        slots = len(self.insured_names)
+        counts = np.bincount(self.insured_codes, minlength=slots)
+        gross = np.bincount(self.insured_codes, weights=self.gross_risk(), minlength=slots)
+        net = np.bincount(self.insured_codes, weights=self.net_risk(), minlength=slots)
+        open_cost = np.bincount(self.insured_codes, weights=np.where(self.remediated, 0.0, self.cost), minlength=slots)
+        return {
+            name: {'incidents': int(counts[i]), 'gross_risk': round(float(gross[i]), 3),
+                   'net_risk': round(float(net[i]), 3), 'open_remediation_cost': round(float(open_cost[i]), 2)}
+            for i, name in enumerate(self.insured_names)
+        }
+
+    def book_summary(self):
+        """
+        Returns book-wide totals plus net risk per risk level.
+        """
+        net = self.net_risk()
+        per_level = np.bincount(self.risk_level, weights=net, minlength=len(RISK_LEVELS))
+        return {
+            'incidents': len(self),
+            'insureds': len(self.insured_names),
+            'gross_risk': round(float(self.gross_risk().sum()), 3),
+            'net_risk': round(float(net.sum()), 3),
+            'remediated': int(self.remediated.sum()),
+            'open_remediation_cost': round(float(self.cost[~self.remediated].sum()), 2),
+            'net_risk_by_level': {level: round(float(per_level[i]), 3) for i, level in enumerate(RISK_LEVELS)},
+        }
+
+    def optimize(self, budget, exact=None):
+        """
+        Chooses open fixes maximizing risk reduction with total cost <= budget.
+        Uses an exact 0/1 knapsack DP when costs are whole numbers and the
+        problem is small enough (EXACT_MAX_CELLS), otherwise a greedy by
+        reduction/cost ratio. Returns a Plan; apply() it to mark the fixes.
+        """
+        reduction = self.gross_risk() * (1.0 - self.residual)
+        candidates = np.flatnonzero(~self.remediated & (reduction > 0))
+        free = candidates[self.cost[candidates] <= 0]
+        paid = candidates[self.cost[candidates] > 0]
+        paid = paid[self.cost[paid] <= budget]
+        costs = self.cost[paid]
+        integral = bool(np.all(costs == np.round(costs)))
+        if exact is None:
+            exact = integral and len(paid) * (math.floor(budget) + 1) <= EXACT_MAX_CELLS
+        if exact and not integral:
+            raise ValueError("exact optimization needs whole-number remediation costs")
+        if exact:
+            chosen = paid[_knapsack_exact(costs.astype(np.int64), reduction[paid], int(math.floor(budget)))]
+            method = 'exact'
+        else:
+            chosen = paid[_knapsack_greedy(costs, reduction[paid], budget)]
+            method = 'greedy'
+        chosen = np.concatenate([free, chosen])
+        return Plan(
+            ids=[str(i) for i in self.ids[chosen]],
+            indices=chosen,
+            cost=round(float(self.cost[chosen].sum()), 2),
+            risk_reduction=round(float(reduction[chosen].sum()), 3),
+            method=method,
+        )
+
+    def apply(self, plan):
+        self.remediated[plan.indices] = True
+
+
+def _knapsack_greedy(costs, values, budget, max_fill_passes=1000):
+    """
+    Greedy by value/cost: take the best-ratio prefix that fits, then keep
+    adding the best-ratio item that still fits. Returns local indices.
+    The result is never worse than the single most valuable affordable item.
+    """
+    if len(costs) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-(values / costs), kind='stable')
+    spent = np.cumsum(costs[order])
+    prefix = int(np.searchsorted(spent, budget, side='right'))
+    taken = list(order[:prefix])
+    left = budget - (spent[prefix - 1] if prefix else 0.0)
+    rest = order[prefix:]
+    for _ in range(max_fill_passes):
+        fits = np.flatnonzero(costs[rest] <= left)
+        if len(fits) == 0:
+            break
+        pick = rest[fits[0]]
+        taken.append(pick)
+        left -= costs[pick]
+        rest = rest[fits[0] + 1:]
+    taken = np.asarray(taken, dtype=np.int64)
+    affordable = np.flatnonzero(costs <= budget)
+    if len(affordable) == 0:
+        return taken
+    best_single = affordable[int(np.argmax(values[affordable]))]
+    if values[best_single] > values[taken].sum():
+        return np.asarray([best_single], dtype=np.int64)
+    return taken
+
+
+def _knapsack_exact(costs, values, budget):
+    """
+    0/1 knapsack DP over integer costs, one vectorized pass per item.
+    Returns local indices of the optimal selection.
+    """
+    best = np.zeros(budget + 1, dtype=np.float64)
+    took = np.zeros((len(costs), budget + 1), dtype=bool)
+    for i, (cost, value) in enumerate(zip(costs, values)):
+        if cost > budget:
+            continue
+        candidate = best[:budget + 1 - cost] + value
+        better = candidate > best[cost:]
+        took[i, cost:] = better
+        best[cost:] = np.where(better, candidate, best[cost:])
+    chosen = []
+    capacity = budget
+    for i in range(len(costs) - 1, -1, -1):
+        if took[i, capacity]:
+            chosen.append(i)
+            capacity -= costs[i]
+    return np.asarray(chosen[::-1], dtype=np.int64)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate portfolio risk and plan remediation for a budget.")
+    parser.add_argument('input', help="incident file (JSON array or JSONL) or incident store (.sqlite3)")
+    parser.add_argument('--budget', type=float, required=True, help="remediation budget")
+    parser.add_argument('--answers', help="JSON file mapping incident id to a list of Yes/No broker answers")
+    parser.add_argument('--residual', type=float, default=0.1, help="fraction of risk left after a fix")
+    parser.add_argument('--where', action='append', metavar='FIELD=VALUE',
+                        help="filter on an indexed incident field (e.g. asset_type=Server), repeatable")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("numpy is required")
+    from batch import parse_where
+    from incident_store import INDEXED
+    filters = parse_where(args.where)
+    unknown = set(filters) - set(INDEXED)
+    if unknown:
+        parser.error(f"--where supports: {', '.join(INDEXED)}")
+    if args.input.endswith(('.sqlite3', '.db')):
+        from incident_store import IncidentStore
+        records = IncidentStore(args.input).query(**filters)
+    else:
+        from batch import iter_incidents
+        records = iter_incidents(args.input)
+        if filters:
+            # Same matching as the store: any listed value, compared as text
+            records = (r for r in records
+                       if all(str(r.get(field)) in wanted for field, wanted in filters.items()))
+    portfolio = Portfolio.from_records(records, residual=args.residual)
+    if args.answers:
+        with open(args.answers, 'r', encoding='utf-8') as f:
+            portfolio.apply_answers(json.load(f))
+    before = portfolio.book_summary()
+    plan = portfolio.optimize(args.budget)
+    portfolio.apply(plan)
+    print(json.dumps({
+        'before': before,
+        'plan': {'fixes': plan.ids, 'cost': plan.cost, 'risk_reduction': plan.risk_reduction, 'method': plan.method},
+        'after': portfolio.book_summary(),
+        'by_insured': portfolio.by_insured(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Speculative prefetch of suggestions and remediation. While the underwriter
+is answering broker questions, the suggestions call for the current answer
+vector runs in the background, so "Generate" usually finds the result ready
+or already in flight. Requests are debounced per session (latest wins) and
+superseded work is cancelled. Speculative spend is capped per hour and per
+session, and hit-rate metrics are kept.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import telemetry
+from providers import cancel_scope
+
+DEFAULT_DEBOUNCE = 0.6
+DEFAULT_BUDGET_USD_PER_HOUR = 0.5
+DEFAULT_MAX_PER_SESSION = 20
+MAX_SESSIONS = 1000
+
+
+def enabled():
+    return os.getenv('PREFETCH', 'on').strip().lower() not in ('0', 'off', 'false', 'no')
+
+
+class _Slot:
+    """
+    Speculative state for one session: the key being prefetched, its debounce
+    timer, the running future, the event that cancels it and its timings.
+    """
+    __slots__ = ('key', 'timer', 'future', 'cancel', 'job', 'taken', 'launched')
+
+    def __init__(self):
+        self.key = None
+        self.timer = None
+        self.future = None
+        self.cancel = None
+        self.job = None
+        self.taken = False
+        self.launched = 0
+
+
+class Prefetcher:
+    def __init__(self, fn, debounce=None, budget_usd_per_hour=None, max_per_session=None, max_workers=4):
+        self.fn = fn
+        self.debounce = float(debounce if debounce is not None
+                              else os.getenv('PREFETCH_DEBOUNCE', DEFAULT_DEBOUNCE))
+        self.budget = float(budget_usd_per_hour if budget_usd_per_hour is not None
+                            else os.getenv('PREFETCH_BUDGET_USD', DEFAULT_BUDGET_USD_PER_HOUR))
+        self.max_per_session = int(max_per_session if max_per_session is not None
+                                   else os.getenv('PREFETCH_MAX_PER_SESSION', DEFAULT_MAX_PER_SESSION))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self.slots = OrderedDict()
+        self.spend = deque()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.counts = {'scheduled': 0, 'launched': 0, 'cancelled': 0, 'wasted': 0, 'ready': 0,
+                           'in_flight': 0, 'misses': 0, 'skipped_budget': 0, 'failed': 0}
+            self.spent_usd = 0.0
+            self.saved_seconds = 0.0
+
+    def _slot(self, session):
+        slot = self.slots.get(session)
+        if slot is None:
+            slot = self.slots[session] = _Slot()
+            while len(self.slots) > MAX_SESSIONS:
+                _, old = self.slots.popitem(last=False)
+                self._drop(old)
+        self.slots.move_to_end(session)
+        return slot
+
+    def _drop(self, slot):
+        """
+        Abandons a slot's pending or running work. Caller holds the lock.
+        """
+        if slot.timer is not None:
+            slot.timer.cancel()
+            slot.timer = None
+        if slot.future is not None and not slot.taken:
+            if slot.future.done():
+                self.counts['wasted'] += 1
+            else:
+                slot.cancel.set()
+                slot.future.cancel()
+                self.counts['cancelled'] += 1
+        slot.future = None
+
+    def _spent_last_hour(self):
+        cutoff = time.time() - 3600
+        while self.spend and self.spend[0][0] < cutoff:
+            self.spend.popleft()
+        return sum(cost for _, cost in self.spend)
+
+    def schedule(self, session, key, *args):
+        """
+        Requests a speculative fn(*args) for `session`, identified by the
+        hashable `key`. Runs after the debounce delay unless a newer request
+        for the session arrives first; supersedes any earlier request.
+        """
+        if not enabled():
+            return
+        with self._lock:
+            slot = self._slot(session)
+            if slot.key == key and (slot.timer is not None or slot.future is not None):
+                return
+            self._drop(slot)
+            slot.key = key
+            slot.taken = False
+            self.counts['scheduled'] += 1
+            context = contextvars.copy_context()
+            slot.timer = threading.Timer(self.debounce, self._launch, (session, key, args, context))
+            slot.timer.daemon = True
+            slot.timer.start()
+
+    def _launch(self, session, key, args, context):
+        with self._lock:
+            slot = self.slots.get(session)
+            if slot is None or slot.key != key or slot.timer is None:
+                return
+            slot.timer = None
+            if slot.launched >= self.max_per_session or self._spent_last_hour() >= self.budget:
+                self.counts['skipped_budget'] += 1
+                return
+            slot.launched += 1
+            slot.cancel = threading.Event()
+            slot.job = {'started': time.perf_counter(), 'finished': None}
+            self.counts['launched'] += 1
+            slot.future = self.executor.submit(context.run, self._run, slot.job, slot.cancel, args)
+
+    def _run(self, job, cancel, args):
+        with telemetry.meter() as totals, cancel_scope(cancel), \
+                telemetry.span('prefetch', speculative=True):
+            try:
+                result = self.fn(*args)
+            finally:
+                with self._lock:
+                    self.spend.append((time.time(), totals['cost_usd']))
+                    self.spent_usd += totals['cost_usd']
+        job['finished'] = time.perf_counter()
+        return result
+
+    def take(self, session, key, timeout=None):
+        """
+        Returns the speculative result for `key`, waiting for it if it is
+        still running, or None if nothing matching was launched (or it failed).
+        A pending debounce for the key is dropped, since the caller is about
+        to compute the result itself.
+        """
+        with self._lock:
+            slot = self.slots.get(session)
+            future = slot.future if slot is not None and slot.key == key else None
+            if future is None:
+                if slot is not None and slot.key == key:
+                    self._drop(slot)
+                    slot.key = None
+                self.counts['misses'] += 1
+                return None
+            slot.taken = True
+            job = slot.job
+            ready = future.done()
+            clicked = time.perf_counter()
+        try:
+            result = future.result(timeout=timeout)
+        except (CancelledError, asyncio.CancelledError, Exception):
+            with self._lock:
+                self.counts['failed'] += 1
+            return None
+        with self._lock:
+            self.counts['ready' if ready else 'in_flight'] += 1
+            # Latency the click didn't have to wait for
+            self.saved_seconds += min(job['finished'] or clicked, clicked) - job['started']
+        return result
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            spent_hour = self._spent_last_hour()
+        hits = counts['ready'] + counts['in_flight']
+        requests = hits + counts['misses'] + counts['failed']
+        return {
+            **counts,
+            'hit_rate': round(hits / requests, 4) if requests else 0.0,
+            'spent_usd': round(self.spent_usd, 6),
+            'spent_usd_last_hour': round(spent_hour, 6),
+            'budget_usd_per_hour': self.budget,
+            'saved_seconds': round(self.saved_seconds, 3),
+        }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """
+    Returns the process-wide Prefetcher for llm_generate_suggestions_and_remediation.
+    """
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            from utils import llm_generate_suggestions_and_remediation
+            _prefetcher = Prefetcher(llm_generate_suggestions_and_remediation)
+        return _prefetcher
@@ -0,0 +1,503 @@
+import asyncio
+import contextvars
+import importlib
+import importlib.util
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import telemetry
+from structured import estimate_tokens
+
+DEFAULT_ORDER = ['openai', 'groq', 'gemini', 'cohere']
+
+Completion = namedtuple('Completion', ['provider', 'model', 'text', 'prompt_tokens', 'completion_tokens'],
+                        defaults=(None, None))
+
+# SDK calls are blocking; they run on this shared executor rather than the
+# event loop's default one so that a losing hedge never holds up asyncio.run().
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_MAX_WORKERS', 32)),
+                               thread_name_prefix='llm-provider')
+
+_cancel_event = contextvars.ContextVar('provider_cancel_event', default=None)
+
+
+class ProviderError(RuntimeError):
+    """
+    Raised when every candidate provider failed; `errors` holds (provider, exception) pairs.
+    """
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class CircuitOpenError(ProviderError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets a single trial call through
+    (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class TokenBucket:
+    """
+    Rate limiter allowing `rate` calls per second with bursts up to `capacity`.
+    Tokens are reserved under a thread lock, so one bucket can be shared by
+    the per-call event loops that sync callers spin up on worker threads.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes one token and returns how many seconds the caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_REGISTRY = {}
+
+
+def register_provider(cls):
+    """
+    Class decorator adding a Provider subclass to the registry get_pool() builds from.
+    """
+    _REGISTRY[cls.name] = cls
+    return cls
+
+
+class Provider:
+    """
+    Base class for an LLM vendor. Holds one long-lived SDK client per process,
+    a window of recent latencies (for the hedging deadline) and a circuit breaker.
+    The vendor SDK (`sdk_module`) is only imported when the provider's client
+    is first built, so unused providers cost nothing at startup.
+    """
+    name = None
+    sdk_module = None
+    key_env = None
+    base_url_env = None
+    default_model = None
+    default_max_tokens = None
+    supports_json_mode = False
+
+    def __init__(self):
+        self._sdk = None
+        self._installed = None
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.latencies = deque(maxlen=200)
+        self.rate_limiter = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', 3)),
+            reset_timeout=float(os.getenv('LLM_BREAKER_RESET', 30))
+        )
+
+    def sdk(self):
+        """
+        Imports and returns the vendor SDK module, or None if it isn't installed.
+        """
+        if self._sdk is None:
+            try:
+                self._sdk = importlib.import_module(self.sdk_module)
+            except ImportError:
+                self._sdk = False
+        return self._sdk or None
+
+    def installed(self):
+        """
+        Returns whether the SDK is importable, without importing it.
+        """
+        if self._installed is None:
+            if self._sdk is not None:
+                self._installed = bool(self._sdk)
+            else:
+                try:
+                    self._installed = importlib.util.find_spec(self.sdk_module) is not None
+                except (ImportError, ValueError):
+                    self._installed = False
+        return self._installed
+
+    def api_key(self):
+        return os.getenv(self.key_env)
+
+    def base_url(self):
+        """
+        Returns an endpoint override (e.g. a local mock server), or None for the vendor default.
+        """
+        return os.getenv(self.base_url_env) if self.base_url_env else None
+
+    def available(self):
+        return bool(self.api_key()) and self.installed()
+
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._build_client()
+            return self._client
+
+    def _build_client(self):
+        raise NotImplementedError
+
+    def _complete_sync(self, client, prompt, model, max_tokens, json_mode=False):
+        """
+        Returns (text, usage) where usage is (prompt_tokens, completion_tokens)
+        as reported by the vendor, or None when it doesn't report any.
+        """
+        raise NotImplementedError
+
+    def deadline(self):
+        """
+        Returns how long to wait for this provider before hedging: the p95 of
+        recent latencies, or LLM_HEDGE_DELAY until enough samples exist.
+        """
+        default = float(os.getenv('LLM_HEDGE_DELAY', 3.0))
+        if len(self.latencies) < 5:
+            return default
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+        return max(0.5, p95)
+
+    async def complete(self, prompt, model=None, max_tokens=None, json_mode=False):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        model = model or self.default_model
+        max_tokens = max_tokens or self.default_max_tokens
+        timeout = float(os.getenv('LLM_REQUEST_TIMEOUT', 60))
+        with telemetry.span('provider.complete', kind='provider', provider=self.name, model=model) as span:
+            try:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                start = time.perf_counter()
+                client = self.client()
+                loop = asyncio.get_running_loop()
+                text, usage = await asyncio.wait_for(
+                    loop.run_in_executor(_executor, self._complete_sync, client, prompt, model, max_tokens,
+                                         json_mode and self.supports_json_mode),
+                    timeout
+                )
+                if not text:
+                    raise ProviderError(f"{self.name} returned an empty completion")
+            except asyncio.CancelledError:
+                # Lost a hedge race; not the provider's fault
+                self.breaker.release_trial()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.latencies.append(time.perf_counter() - start)
+            self.breaker.record_success()
+            prompt_tokens, completion_tokens = usage or (estimate_tokens(prompt), estimate_tokens(text))
+            span['attributes'].update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                      usage_reported=usage is not None)
+        return Completion(self.name, model, text.strip(), prompt_tokens, completion_tokens)
+
+
+def _openai_usage(resp):
+    # OpenAI-compatible responses (OpenAI, Groq) carry a `usage` block
+    usage = getattr(resp, 'usage', None)
+    if not usage:
+        return None
+    if isinstance(usage, dict):
+        return usage.get('prompt_tokens'), usage.get('completion_tokens')
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+@register_provider
+class OpenAIProvider(Provider):
+    name = 'openai'
+    sdk_module = 'openai'
+    key_env = 'OPENAI_API_KEY'
+    base_url_env = 'OPENAI_API_BASE'
+    default_model = 'gpt-3.5-turbo'
+    supports_json_mode = True
+
+    def _build_client(self):
+        openai = self.sdk()
+        openai.api_key = self.api_key()
+        if self.base_url():
+            openai.api_base = self.base_url()
+        return openai
+
+    def _complete_sync(self, client, prompt, model, max_tokens, json_mode=False):
+        kwargs = {'max_tokens': max_tokens} if max_tokens else {}
+        if json_mode:
+            kwargs['response_format'] = {'type': 'json_object'}
+        resp = client.ChatCompletion.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+        return resp.choices[0].message.content, _openai_usage(resp)
+
+    def stream(self, prompt, model=None, max_tokens=None, json_mode=False):
+        """
+        Yields content deltas from a streaming chat completion.
+        """
+        kwargs = {'max_tokens': max_tokens} if max_tokens else {}
+        if json_mode:
+            kwargs['response_format'] = {'type': 'json_object'}
+        for chunk in self.client().ChatCompletion.create(
+            model=model or self.default_model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **kwargs
+        ):
+            yield chunk.choices[0].delta.get('content') or ''
+
+
+@register_provider
+class GroqProvider(Provider):
+    name = 'groq'
+    sdk_module = 'groq'
+    key_env = 'GROQ_API_KEY'
+    base_url_env = 'GROQ_BASE_URL'
+    default_model = 'mixtral-8x7b-32768'
+    supports_json_mode = True
+
+    def _build_client(self):
+        return self.sdk().Groq(api_key=self.api_key(), base_url=self.base_url())
+
+    def _complete_sync(self, client, prompt, model, max_tokens, json_mode=False):
+        kwargs = {'max_tokens': max_tokens} if max_tokens else {}
+        if json_mode:
+            kwargs['response_format'] = {'type': 'json_object'}
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+        return resp.choices[0].message.content, _openai_usage(resp)
+
+
+@register_provider
+class GeminiProvider(Provider):
+    name = 'gemini'
+    sdk_module = 'google.generativeai'
+    key_env = 'GEMINI_API_KEY'
+    base_url_env = 'GEMINI_API_BASE'
+    default_model = 'gemini-pro'
+
+    def _build_client(self):
+        if self.base_url():
+            self.sdk().configure(api_key=self.api_key(), transport='rest',
+                                 client_options={'api_endpoint': self.base_url()})
+        else:
+            self.sdk().configure(api_key=self.api_key())
+        # GenerativeModel instances are cheap but reused per model name
+        return {}
+
+    def _complete_sync(self, client, prompt, model, max_tokens, json_mode=False):
+        if model not in client:
+            client[model] = self.sdk().GenerativeModel(model)
+        kwargs = {'generation_config': {'max_output_tokens': max_tokens}} if max_tokens else {}
+        resp = client[model].generate_content(prompt, **kwargs)
+        meta = getattr(resp, 'usage_metadata', None)
+        usage = (meta.prompt_token_count, meta.candidates_token_count) if meta else None
+        return resp.text, usage
+
+
+@register_provider
+class CohereProvider(Provider):
+    name = 'cohere'
+    sdk_module = 'cohere'
+    key_env = 'COHERE_API_KEY'
+    base_url_env = 'COHERE_BASE_URL'
+    default_model = 'command'
+    default_max_tokens = 300
+
+    def _build_client(self):
+        if self.base_url():
+            return self.sdk().Client(self.api_key(), base_url=self.base_url())
+        return self.sdk().Client(self.api_key())
+
+    def _complete_sync(self, client, prompt, model, max_tokens, json_mode=False):
+        resp = client.generate(model=model, prompt=prompt, max_tokens=max_tokens)
+        units = getattr(getattr(resp, 'meta', None), 'billed_units', None)
+        usage = (units.input_tokens, units.output_tokens) if units else None
+        return resp.generations[0].text, usage
+
+
+class ProviderPool:
+    """
+    Routes a prompt across providers in preference order. The primary gets
+    until its p95-based deadline; past that a secondary is fired in parallel
+    (hedged) and the first valid answer wins. Errors fall through to the next
+    provider immediately, and providers with an open circuit are skipped.
+    """
+
+    def __init__(self, providers):
+        self.providers = {p.name: p for p in providers}
+
+    def get(self, name):
+        return self.providers[name]
+
+    def available(self, order=None):
+        """
+        Returns the configured providers in `order` (SDK installed and API key set).
+        """
+        return [self.providers[name] for name in (order or DEFAULT_ORDER)
+                if name in self.providers and self.providers[name].available()]
+
+    async def complete(self, prompt, order=None, hedge=True, models=None, max_tokens=None, json_mode=False):
+        models = models or {}
+        queue = self.available(order)
+        if not queue:
+            raise ProviderError("No valid API key found for " + ", ".join(order or DEFAULT_ORDER) + ".")
+        pending = {}
+        errors = []
+
+        def launch():
+            while queue:
+                provider = queue.pop(0)
+                if provider.breaker.state == 'open':
+                    errors.append((provider.name, CircuitOpenError(f"{provider.name} circuit is open")))
+                    continue
+                task = asyncio.ensure_future(provider.complete(prompt, models.get(provider.name), max_tokens, json_mode))
+                pending[task] = provider
+                return provider
+            return None
+
+        last = launch()
+        try:
+            while pending:
+                timeout = last.deadline() if (hedge and queue and last is not None) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    last = launch() or last
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append((provider.name, task.exception()))
+                if queue:
+                    last = launch() or last
+        finally:
+            for task in pending:
+                task.cancel()
+        raise ProviderError(
+            "All providers failed: " + "; ".join(f"{name}: {err}" for name, err in errors),
+            errors
+        )
+
+    def complete_sync(self, prompt, order=None, hedge=True, models=None, max_tokens=None, json_mode=False):
+        """
+        Blocking wrapper around complete() for Streamlit and other sync callers.
+        Honours an enclosing cancel_scope().
+        """
+        call = self.complete(prompt, order, hedge, models, max_tokens, json_mode)
+        cancel = _cancel_event.get()
+        if cancel is None:
+            return asyncio.run(call)
+        return asyncio.run(_cancellable(call, cancel))
+
+
+@contextmanager
+def cancel_scope(event):
+    """
+    Makes complete_sync() calls in the enclosed block raise
+    asyncio.CancelledError once `event` (a threading.Event) is set. A blocking
+    SDK request already in flight finishes on its worker thread, but its
+    result is dropped and no hedge, escalation or repair call follows.
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+async def _cancellable(coro, event, poll=0.05):
+    if event.is_set():
+        coro.close()
+        raise asyncio.CancelledError("cancelled before start")
+    task = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll)
+        if done:
+            return task.result()
+        if event.is_set():
+            task.cancel()
+            raise asyncio.CancelledError("cancelled by caller")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide ProviderPool so SDK clients are built once and reused.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProviderPool([cls() for cls in _REGISTRY.values()])
+        return _pool
@@ -0,0 +1,231 @@
+"""
+Cost/latency-aware model routing. Each incident gets a complexity score from
+its size, how many incident classes it touches, how well the local rules
+recognise it and hard-case indicators (lateral movement, exfiltration, ...).
+Simple incidents go to a small, fast tier with tight output budgets; harder
+ones start on a larger tier. A failed or low-confidence answer escalates one
+tier up. Tiers, budgets and the escalation policy are configurable.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+import telemetry
+from providers import ProviderError
+from rules import HARD_INDICATORS, PatternMatcher, get_ruleset
+from structured import StructuredOutputError, estimate_tokens
+
+# Tiers in escalation order. A request starts on the first tier whose
+# max_complexity covers its score (and whose max_prompt_tokens fits the
+# prompt); max_tokens is the output budget per pipeline stage.
+DEFAULT_TIERS = [
+    {
+        'name': 'small',
+        'max_complexity': 0.35,
+        'max_prompt_tokens': 1500,
+        'models': {'openai': 'gpt-4o-mini', 'groq': 'llama-3.1-8b-instant',
+                   'gemini': 'gemini-1.5-flash', 'cohere': 'command-light'},
+        'max_tokens': {'parse': 700, 'broker_questions': 150, 'suggestions': 450,
+                       'remediation': 300, 'default': 300},
+    },
+    {
+        'name': 'standard',
+        'max_complexity': 0.7,
+        'max_prompt_tokens': 6000,
+        'models': {'openai': 'gpt-3.5-turbo', 'groq': 'mixtral-8x7b-32768',
+                   'gemini': 'gemini-pro', 'cohere': 'command'},
+        'max_tokens': {'parse': 1000, 'broker_questions': 250, 'suggestions': 700,
+                       'remediation': 500, 'default': 500},
+    },
+    {
+        'name': 'large',
+        'max_complexity': 1.0,
+        'models': {'openai': 'gpt-4o', 'groq': 'llama-3.1-70b-versatile',
+                   'gemini': 'gemini-1.5-pro', 'cohere': 'command-r-plus'},
+        'max_tokens': {'parse': 1600, 'broker_questions': 400, 'suggestions': 1100,
+                       'remediation': 800, 'default': 800},
+    },
+]
+
+DEFAULT_ESCALATE_CONFIDENCE = 0.6
+DEFAULT_MAX_ESCALATIONS = 1
+
+Route = namedtuple('Route', ['tier', 'level', 'models', 'max_tokens', 'complexity', 'prompt_tokens', 'escalations'])
+
+
+def load_tiers():
+    """
+    Returns the tier list from ROUTER_TIERS (inline JSON or a path to a JSON file), else the defaults.
+    """
+    value = os.getenv('ROUTER_TIERS', '').strip()
+    if not value:
+        return DEFAULT_TIERS
+    if not value.startswith('['):
+        with open(value, 'r', encoding='utf-8') as f:
+            value = f.read()
+    tiers = json.loads(value)
+    if not isinstance(tiers, list) or not tiers or not all('name' in t and 'models' in t for t in tiers):
+        raise ValueError("ROUTER_TIERS must be a non-empty list of tiers with 'name' and 'models'")
+    return tiers
+
+
+class Router:
+    def __init__(self, tiers=None, escalate_below=None, max_escalations=None):
+        self.tiers = tiers if tiers is not None else load_tiers()
+        self.escalate_below = float(escalate_below if escalate_below is not None
+                                    else os.getenv('ROUTER_ESCALATE_CONFIDENCE', DEFAULT_ESCALATE_CONFIDENCE))
+        self.max_escalations = int(max_escalations if max_escalations is not None
+                                   else os.getenv('ROUTER_MAX_ESCALATIONS', DEFAULT_MAX_ESCALATIONS))
+        self.indicators = PatternMatcher(HARD_INDICATORS)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.tier_stats = {tier['name']: {'calls': 0, 'served': 0, 'latency': 0.0, 'cost_usd': 0.0}
+                               for tier in self.tiers}
+            self.escalations = {'failure': 0, 'low_confidence': 0}
+
+    def complexity(self, incident_text):
+        """
+        Returns a 0-1 complexity score for an incident.
+        """
+        text = str(incident_text or '')
+        tokens = estimate_tokens(text)
+        matched = get_ruleset().classify(text)
+        best = max((confidence for _, confidence in matched), default=0.0)
+        hard = len(set(self.indicators.matches(text.lower())))
+        size = min(1.0, math.log1p(tokens) / math.log1p(600))
+        breadth = min(1.0, max(0, len(matched) - 1) / 3)
+        unfamiliar = 1.0 - best
+        indicators = min(1.0, hard / 3)
+        return round(0.35 * size + 0.2 * breadth + 0.2 * unfamiliar + 0.25 * indicators, 4)
+
+    def _route(self, level, complexity, prompt_tokens, stage, escalations=0):
+        tier = self.tiers[level]
+        budget = tier.get('max_tokens')
+        if isinstance(budget, dict):
+            budget = budget.get(stage, budget.get('default'))
+        return Route(tier['name'], level, dict(tier['models']), budget, complexity, prompt_tokens, escalations)
+
+    def route(self, incident_text, stage, prompt):
+        """
+        Returns the starting Route for a call, or None when routing is disabled (LLM_ROUTER=off).
+        """
+        if os.getenv('LLM_ROUTER', 'on').strip().lower() in ('0', 'off', 'false', 'no'):
+            return None
+        complexity = self.complexity(incident_text)
+        prompt_tokens = estimate_tokens(prompt)
+        level = len(self.tiers) - 1
+        for index, tier in enumerate(self.tiers):
+            if complexity <= tier.get('max_complexity', 1.0) and prompt_tokens <= tier.get('max_prompt_tokens', math.inf):
+                level = index
+                break
+        return self._route(level, complexity, prompt_tokens, stage)
+
+    def escalate(self, route, stage):
+        """
+        Returns the Route one tier up, or None at the top tier or escalation limit.
+        """
+        if route.escalations >= self.max_escalations or route.level + 1 >= len(self.tiers):
+            return None
+        return self._route(route.level + 1, route.complexity, route.prompt_tokens, stage, route.escalations + 1)
+
+    def record(self, route, started, completions, served=True):
+        """
+        Records a routed call made outside run(), e.g. a streamed completion,
+        so mix() covers every call that used a tier.
+        """
+        self._record(route, started, completions, served)
+
+    def _record(self, route, started, completions, served, escalated=None):
+        cost = sum(telemetry.estimate_cost(c.model, c.prompt_tokens, c.completion_tokens) for c in completions)
+        with self._lock:
+            stats = self.tier_stats.setdefault(route.tier, {'calls': 0, 'served': 0, 'latency': 0.0, 'cost_usd': 0.0})
+            stats['calls'] += 1
+            stats['served'] += 1 if served else 0
+            stats['latency'] += time.perf_counter() - started
+            stats['cost_usd'] += cost
+            if escalated:
+                self.escalations[escalated] += 1
+
+    def run(self, incident_text, stage, prompt, call, confidence=None):
+        """
+        Runs call(route, completions) on the routed tier, escalating on
+        provider/structured-output failure or when confidence(result) falls
+        below ROUTER_ESCALATE_CONFIDENCE. `call` appends the Completions it
+        used to `completions` so their cost can be attributed to the tier.
+        """
+        route = self.route(incident_text, stage, prompt)
+        if route is None:
+            return call(None, [])
+        telemetry.annotate(tier=route.tier, complexity=route.complexity)
+        fallback = None
+        while True:
+            started = time.perf_counter()
+            completions = []
+            try:
+                result = call(route, completions)
+            except (ProviderError, StructuredOutputError):
+                upgraded = self.escalate(route, stage)
+                self._record(route, started, completions, served=False, escalated='failure' if upgraded else None)
+                if upgraded is None:
+                    if fallback is not None:
+                        return fallback
+                    raise
+                route = upgraded
+                telemetry.annotate(tier=route.tier, escalated='failure')
+                continue
+            score = confidence(result) if (confidence is not None and result is not None) else None
+            upgraded = self.escalate(route, stage) if score is not None and score < self.escalate_below else None
+            self._record(route, started, completions, served=upgraded is None,
+                         escalated='low_confidence' if upgraded else None)
+            if upgraded is None:
+                return result
+            # Keep the low-confidence answer in case the larger tier fails
+            fallback = result
+            route = upgraded
+            telemetry.annotate(tier=route.tier, escalated='low_confidence')
+
+    def mix(self):
+        """
+        Returns the share of answers served per tier with their mean latency
+        and cost, plus escalation counts.
+        """
+        with self._lock:
+            served = sum(s['served'] for s in self.tier_stats.values())
+            calls = sum(s['calls'] for s in self.tier_stats.values())
+            tiers = {
+                name: {
+                    'calls': s['calls'],
+                    'share_served': round(s['served'] / served, 4) if served else 0.0,
+                    'mean_latency_ms': round(s['latency'] / s['calls'] * 1000, 1) if s['calls'] else 0.0,
+                    'cost_usd': round(s['cost_usd'], 6),
+                }
+                for name, s in self.tier_stats.items()
+            }
+            total_latency = sum(s['latency'] for s in self.tier_stats.values())
+            return {
+                'tiers': tiers,
+                'escalations': dict(self.escalations),
+                'mean_latency_ms': round(total_latency / calls * 1000, 1) if calls else 0.0,
+                'cost_usd': round(sum(s['cost_usd'] for s in self.tier_stats.values()), 6),
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """
+    Returns the process-wide Router.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router()
+        return _router
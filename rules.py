@@ -0,0 +1,344 @@
+"""
+Declarative incident-classification rules compiled into a single
+Aho-Corasick automaton, so every pattern of every rule is matched in one
+pass over the incident text.
+"""
+import os
+import re
+from collections import deque
+
+# Each rule is one incident class. `patterns` maps a lowercase phrase to the
+# evidence weight it contributes; a phrase matches at a word start and may run
+# on into a longer word ("patch" matches "patched"). Rule confidence is the
+# strongest matched weight: a rule's phrases mostly restate each other
+# ("public s3", "s3 bucket", "bucket"), so they aren't independent evidence.
+# A match preceded in its clause by a denial ("no evidence of ransomware") is
+# ignored, except for `control_gap` rules, where the negation is the finding
+# ("no MFA", "not patched").
+RULES = [
+    {
+        'id': 'missing_mfa',
+        'control_gap': True,
+        'label': "Missing multi-factor authentication",
+        'severity': 3,
+        'patterns': {'mfa': 0.8, 'multi-factor': 0.8, 'multifactor': 0.8, '2fa': 0.8,
+                     'two-factor': 0.8, 'weak password': 0.6, 'password spray': 0.6,
+                     'credential stuffing': 0.6},
+        'checklist': ["Check MFA enforcement for all admin accounts",
+                      "Review password policy and credential hygiene"],
+        'questions': ["Is Multi-Factor Authentication (MFA) enabled for all relevant accounts?"],
+        'mitigations': ["Enforce MFA on all admin, remote access and email accounts.",
+                        "Enforce least privilege access for all accounts."],
+        'remediation': "Enforce MFA on every privileged and remote-access account and reset weak credentials.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'rdp_exposed',
+        'label': "RDP exposed to the internet",
+        'severity': 3,
+        'patterns': {'rdp': 0.8, 'remote desktop': 0.8, '3389': 0.7},
+        'checklist': ["Assess network segmentation and firewall rules",
+                      "Confirm remote access is restricted to VPN"],
+        'questions': ["Is RDP access restricted to VPN or internal networks only?"],
+        'mitigations': ["Close port 3389 to the internet and require VPN for remote access.",
+                        "Implement network monitoring for suspicious activity."],
+        'remediation': "Block inbound RDP at the perimeter and move remote access behind a VPN with MFA.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'unpatched_software',
+        'control_gap': True,
+        'label': "Unpatched or outdated software",
+        'severity': 2,
+        'patterns': {'patch': 0.6, 'unpatched': 0.8, 'outdated': 0.7, 'cve': 0.6,
+                     'end of life': 0.7, 'end-of-life': 0.7, 'eol': 0.5, 'vulnerable version': 0.6},
+        'checklist': ["Verify patch status for affected systems",
+                      "Confirm vulnerability scanning cadence"],
+        'questions': ["Are all systems fully patched and up to date?"],
+        'mitigations': ["Recommend upgrading all related services to the latest supported version.",
+                        "Adopt a patch SLA for critical CVEs."],
+        'remediation': "Upgrade the affected software to the latest supported version and apply outstanding security patches.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'public_storage',
+        'label': "Publicly accessible cloud storage",
+        'severity': 3,
+        'patterns': {'s3 bucket': 0.7, 'public s3': 0.9, 'bucket': 0.4, 'blob container': 0.6,
+                     'publicly accessible': 0.6, 'public bucket': 0.9, 'open bucket': 0.8},
+        'checklist': ["Review cloud storage access policies",
+                      "Confirm asset inventory for cloud resources"],
+        'questions': ["Is public access blocked on all cloud storage buckets?"],
+        'mitigations': ["Enable account-level public access blocks on cloud storage.",
+                        "Rotate any credentials stored in the exposed bucket."],
+        'remediation': "Disable public access on the bucket, rotate exposed credentials and review access logs.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'public_exposure',
+        'label': "Service exposed to the public internet",
+        'severity': 2,
+        'patterns': {'public': 0.4, 'exposed': 0.5, 'open to the internet': 0.6,
+                     'accessible from the internet': 0.6, 'internet-facing': 0.5},
+        'checklist': ["Assess network segmentation and firewall rules"],
+        'questions': ["Are any sensitive resources exposed to the public internet?"],
+        'mitigations': ["Restrict exposed services to known IP ranges or a VPN."],
+        'remediation': "Remove public exposure of the affected service and restrict access to trusted networks.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'open_database',
+        'control_gap': True,
+        'label': "Database reachable without authentication",
+        'severity': 3,
+        'patterns': {'mongodb': 0.5, 'elasticsearch': 0.5, 'redis': 0.5, 'database': 0.3,
+                     'without authentication': 0.8, 'no authentication': 0.8,
+                     'unauthenticated': 0.7},
+        'checklist': ["Confirm databases require authentication",
+                      "Assess network segmentation and firewall rules"],
+        'questions': ["Do all databases require authentication and block internet access?"],
+        'mitigations': ["Enable authentication and bind databases to private interfaces only.",
+                        "Review database access logs for unauthorized reads."],
+        'remediation': "Enable authentication on the database, restrict it to private networks and review access logs.",
+        'recommendation': "Request fix",
+    },
+    {
+        'id': 'phishing',
+        'label': "Phishing or social engineering",
+        'severity': 2,
+        'patterns': {'phishing': 0.9, 'impersonat': 0.6, 'spoof': 0.6, 'social engineering': 0.8,
+                     'business email compromise': 0.9},
+        'checklist': ["Confirm security awareness training is current",
+                      "Check email authentication (SPF, DKIM, DMARC)"],
+        'questions': ["Do employees complete regular phishing awareness training?",
+                      "Are SPF, DKIM and DMARC enforced for company email domains?"],
+        'mitigations': ["Run targeted phishing awareness training.",
+                        "Enforce DMARC with a reject policy."],
+        'remediation': "Block the sender, reset any exposed credentials and reinforce phishing awareness training.",
+        'recommendation': "Accept risk",
+    },
+    {
+        'id': 'ransomware',
+        'label': "Ransomware activity",
+        'severity': 4,
+        'patterns': {'ransomware': 0.9, 'encrypted files': 0.6, 'ransom note': 0.9},
+        'checklist': ["Review backup and recovery procedures",
+                      "Validate incident response plan is up to date"],
+        'questions': ["Are offline, immutable backups tested regularly?"],
+        'mitigations': ["Maintain offline, immutable backups and test restores.",
+                        "Deploy EDR on all endpoints."],
+        'remediation': "Isolate affected hosts, restore from clean backups and engage incident response.",
+        'recommendation': "Decline policy",
+    },
+]
+
+DEFAULT_SKIP_LLM_CONFIDENCE = 0.9
+
+# Phrases that mark an incident as hard to reason about: attacker activity
+# past initial access, sensitive data at stake or legal/regulatory exposure.
+# Counting words ("multiple", "several") are left out; they show up in simple
+# incidents too and breadth is already scored from the matched rule classes.
+# The router scores them; the fast path never answers an incident with one.
+HARD_INDICATORS = [
+    'lateral movement', 'exfiltrat', 'ransom', 'encrypted', 'domain controller', 'active directory',
+    'privilege escalation', 'persistence', 'supply chain', 'zero-day', '0-day', 'forensic',
+    'threat actor', 'command and control', 'c2', 'backdoor', 'regulator', 'breach notification',
+    'credential dumping', 'mimikatz', 'pass-the-hash', 'kerberoast', 'golden ticket', 'web shell',
+    'webshell', 'wiper', 'insider', 'extortion', 'data breach', 'cardholder', 'health records',
+]
+
+NEGATIONS = frozenset(['no', 'not', 'never', 'without', 'none', 'nor', "isn't", "wasn't", "aren't",
+                       "weren't", "didn't", "doesn't", "hasn't", "haven't"])
+# How many words before a match a denial still applies to, within its clause
+NEGATION_WINDOW = 3
+_CLAUSE_BREAK = re.compile(r"[.;:!?,()]|\b(?:but|however|although|though)\b")
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of lowercase patterns.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(index)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def matches(self, text):
+        """
+        Returns the set of pattern indexes that occur in `text` at a word start.
+        """
+        return {index for index, _ in self.find(text)}
+
+    def find(self, text):
+        """
+        Returns (pattern index, start offset) for every occurrence in `text` at a word start.
+        """
+        found = []
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                start = pos - len(patterns[index]) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    found.append((index, start))
+        return found
+
+
+def negated(text, start):
+    """
+    True when one of the NEGATION_WINDOW words before `start` in the same
+    clause is a denial. `text` is lowercase.
+    """
+    clause = _CLAUSE_BREAK.split(text[max(0, start - 80):start])[-1]
+    return any(word.strip('"\'') in NEGATIONS for word in clause.split()[-NEGATION_WINDOW:])
+
+
+class RuleSet:
+    """
+    A compiled set of rules. classify() returns matched rules with confidences;
+    triage() assembles them into the same shape llm_parse_incident_and_generate_all returns.
+    """
+
+    def __init__(self, rules=RULES):
+        self.rules = list(rules)
+        patterns = []
+        self._owners = []
+        for rule_index, rule in enumerate(self.rules):
+            for pattern, weight in rule['patterns'].items():
+                patterns.append(pattern.lower())
+                self._owners.append((rule_index, weight))
+        # Denial words ride along in the same automaton, owned by no rule
+        for word in sorted(NEGATIONS):
+            patterns.append(word)
+            self._owners.append((None, 0.0))
+        self.matcher = PatternMatcher(patterns)
+        self.hard_indicators = PatternMatcher(HARD_INDICATORS)
+
+    def scan(self, text):
+        """
+        Returns (matched, denied): the (rule, confidence) list classify()
+        returns, and whether any match was preceded by a denial.
+        """
+        text = text.lower()
+        best = {}
+        denied = False
+        found = self.matcher.find(text)
+        patterns, owners = self.matcher.patterns, self._owners
+        # Whole-word denials ("no", not the start of "normal"); only matches
+        # with one shortly before them need the clause check
+        denials = [start for index, start in found if owners[index][0] is None
+                   and not text[start + len(patterns[index]):start + len(patterns[index]) + 1].isalnum()]
+        for index, start in found:
+            rule_index, weight = owners[index]
+            if rule_index is None:
+                continue
+            if denials and any(start - 80 <= d < start for d in denials) and negated(text, start):
+                denied = True
+                if not self.rules[rule_index].get('control_gap'):
+                    continue
+            if weight > best.get(rule_index, 0.0):
+                best[rule_index] = weight
+        return [(self.rules[i], best[i]) for i in sorted(best)], denied
+
+    def classify(self, text):
+        """
+        Returns a list of (rule, confidence) for every matched rule, in rule order.
+        """
+        return self.scan(text)[0]
+
+    def triage(self, text, matched=None):
+        """
+        Returns a full triage dict built from matched rules (classified from
+        `text` unless given), or None if nothing matched.
+        """
+        if matched is None:
+            matched = self.classify(text)
+        if not matched:
+            return None
+        checklist, questions, mitigations = [], [], []
+        checklist_questions = {}
+        for rule, _ in matched:
+            for item in rule['checklist']:
+                checklist_questions.setdefault(item, [])
+                for question in rule['questions']:
+                    if question not in checklist_questions[item]:
+                        checklist_questions[item].append(question)
+            for target, items in ((checklist, rule['checklist']),
+                                  (questions, rule['questions']),
+                                  (mitigations, rule['mitigations'])):
+                for item in items:
+                    if item not in target:
+                        target.append(item)
+        primary, confidence = max(matched, key=lambda m: (m[1], m[0]['severity']))
+        worst = max(matched, key=lambda m: m[0]['severity'])[0]
+        labels = ', '.join(rule['label'] for rule, _ in matched)
+        return {
+            'checklist': checklist,
+            'broker_questions': questions,
+            'risk_mitigation': mitigations,
+            'remediation': ' '.join(rule['remediation'] for rule, _ in matched),
+            'recommendation': worst['recommendation'],
+            'confidence': confidence,
+            'broker_summary': f"{primary['label']} identified. {primary['remediation']}",
+            'explanation': f"Classified by local rules as: {labels}. The recommendation follows the most severe matched class.",
+            'checklist_questions': checklist_questions,
+            'source': 'rules',
+        }
+
+
+_ruleset = None
+
+
+def get_ruleset():
+    """
+    Returns the process-wide compiled RuleSet.
+    """
+    global _ruleset
+    if _ruleset is None:
+        _ruleset = RuleSet()
+    return _ruleset
+
+
+def fast_path(text, threshold=None):
+    """
+    Returns the rule-based triage when exactly one rule matches, confidently
+    enough to skip the LLM (RULES_SKIP_LLM_CONFIDENCE, default 0.9), else
+    None. Incidents touching several classes, containing a denial or showing
+    a hard-case indicator always go to the LLM.
+    """
+    if threshold is None:
+        threshold = float(os.getenv('RULES_SKIP_LLM_CONFIDENCE', DEFAULT_SKIP_LLM_CONFIDENCE))
+    ruleset = get_ruleset()
+    matched, denied = ruleset.scan(text)
+    if denied or len(matched) != 1 or matched[0][1] < threshold:
+        return None
+    if ruleset.hard_indicators.matches(text.lower()):
+        return None
+    return ruleset.triage(text, matched)
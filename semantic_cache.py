@@ -0,0 +1,242 @@
+"""
+Near-duplicate incident cache. Incidents are normalized (dates, hostnames
+and IPs masked; ports, versions and CVE IDs kept), embedded as signed hashed
+word and character n-gram vectors, and searched with a single vectorized
+cosine product, entirely offline. A cached result is only reused for an
+incident the local rules classify the same way. Entries are appended to a
+JSONL file and re-embedded on load, so the index survives restarts and any
+process can warm it for the next one.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_PATH = os.path.join('.cache', 'semantic_index.jsonl')
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_DIM = 1024
+DEFAULT_MAX_ENTRIES = 10000
+
+_MONTHS = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?'
+_MASKS = [
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2})?)?\b'), ' <date> '),
+    # Dotted dates need a four-digit year so version strings (2.4.29) survive
+    (re.compile(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b|\b\d{1,2}\.\d{1,2}\.\d{4}\b'), ' <date> '),
+    (re.compile(r'\b' + _MONTHS + r'\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?\b'), ' <date> '),
+    (re.compile(r'\b\d{1,2}(?:st|nd|rd|th)?\s+' + _MONTHS + r'(?:,?\s+\d{4})?\b'), ' <date> '),
+    (re.compile(r'\b(?:last|this|next)\s+(?:week|month|night|year)\b|\b(?:yesterday|today)\b'), ' <date> '),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?\b'), ' <ip> '),
+    (re.compile(r'\b(?:[a-z0-9-]+\.)+(?:com|net|org|io|local|internal|corp|lan)\b'), ' <host> '),
+    # Host names like web-01 or srv-db-3, but not CVE IDs
+    (re.compile(r'\b(?!cve-)[a-z]+(?:-[a-z0-9]+)*-\d+[a-z0-9-]*\b'), ' <host> '),
+]
+
+
+def normalize_incident(text):
+    """
+    Lowercases and masks the details that vary between otherwise identical
+    incidents. Ports, versions and CVE IDs decide the triage and are kept.
+    """
+    text = str(text).lower()
+    for pattern, placeholder in _MASKS:
+        text = pattern.sub(placeholder, text)
+    return ' '.join(text.split())
+
+
+def _features(normalized):
+    words = re.findall(r'<\w+>|[a-z0-9]+', normalized)
+    feats = {}
+    for n in (1, 2):
+        for i in range(len(words) - n + 1):
+            key = 'w:' + ' '.join(words[i:i + n])
+            feats[key] = feats.get(key, 0) + 1
+    padded = f' {normalized} '
+    for n in (3, 4):
+        for i in range(len(padded) - n + 1):
+            key = 'c:' + padded[i:i + n]
+            feats[key] = feats.get(key, 0) + 1
+    return feats
+
+
+def embed(text, dim=DEFAULT_DIM):
+    """
+    Returns the L2-normalized signed hashed n-gram vector for an incident.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for key, count in _features(normalize_incident(text)).items():
+        h = zlib.crc32(key.encode('utf-8'))
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        vector[h % dim] += sign * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def incident_category(text):
+    """
+    Returns the ids of the local rules an incident matches, as a sorted tuple.
+    """
+    from rules import get_ruleset
+    return tuple(sorted(rule['id'] for rule, _ in get_ruleset().classify(str(text))))
+
+
+class SemanticCache:
+    """
+    In-memory matrix of incident vectors plus their LLM results. lookup()
+    returns the best prior result above `threshold` cosine similarity among
+    entries in the same rule category as the query.
+    """
+
+    def __init__(self, path=None, threshold=None, dim=DEFAULT_DIM, max_entries=None):
+        self.path = path if path is not None else os.getenv('SEMANTIC_CACHE_PATH', DEFAULT_PATH)
+        self.threshold = float(threshold if threshold is not None
+                               else os.getenv('SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD))
+        self.dim = dim
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self.matrix = np.zeros((min(self.max_entries, 256), dim), dtype=np.float32)
+        self.category_codes = np.zeros(self.matrix.shape[0], dtype=np.int32)
+        self.category_index = {}
+        self.entries = []
+        self._next = 0
+        self.logged = 0
+        self.lookups = 0
+        self.hits = 0
+        self.latency_saved = 0.0
+        self.lookup_time = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        self.logged = len(records)
+        for record in records[-self.max_entries:]:
+            self._insert(record['text'], record['result'], record.get('latency', 0.0))
+
+    def _insert(self, text, result, latency):
+        entry = {'text': text, 'result': result, 'latency': latency}
+        if len(self.entries) >= self.max_entries:
+            # Full: overwrite the oldest slot (ring buffer)
+            slot = self._next
+            self._next = (self._next + 1) % self.max_entries
+            self.entries[slot] = entry
+        else:
+            if len(self.entries) == self.matrix.shape[0]:
+                grown = np.zeros((min(self.max_entries, self.matrix.shape[0] * 2), self.dim), dtype=np.float32)
+                grown[:len(self.entries)] = self.matrix[:len(self.entries)]
+                self.matrix = grown
+                codes = np.zeros(grown.shape[0], dtype=np.int32)
+                codes[:len(self.entries)] = self.category_codes[:len(self.entries)]
+                self.category_codes = codes
+            slot = len(self.entries)
+            self.entries.append(entry)
+        self.matrix[slot] = embed(text, self.dim)
+        self.category_codes[slot] = self._category_code(incident_category(text))
+
+    def _category_code(self, category):
+        return self.category_index.setdefault(category, len(self.category_index))
+
+    def lookup(self, text):
+        """
+        Returns (result, similarity) for the closest prior incident, or (None, best_similarity).
+        """
+        start = time.perf_counter()
+        query = embed(text, self.dim)
+        category = incident_category(text)
+        with self._lock:
+            self.lookups += 1
+            count = len(self.entries)
+            if count == 0:
+                self.lookup_time += time.perf_counter() - start
+                return None, 0.0
+            scores = self.matrix[:count] @ query
+            code = self.category_index.get(category)
+            # Entries from another rule category never match
+            scores = np.where(self.category_codes[:count] == code, scores, -1.0) if code is not None \
+                else np.full(count, -1.0, dtype=np.float32)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            self.lookup_time += time.perf_counter() - start
+            if similarity < self.threshold:
+                return None, similarity
+            entry = self.entries[best]
+            self.hits += 1
+            self.latency_saved += entry['latency']
+            result = dict(entry['result'])
+        result['source'] = 'semantic_cache'
+        result['similarity'] = round(similarity, 4)
+        result['similar_incident'] = entry['text']
+        return result, similarity
+
+    def add(self, text, result, latency=0.0):
+        """
+        Indexes an LLM result and appends it to the on-disk log.
+        """
+        with self._lock:
+            self._insert(text, result, latency)
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self.logged >= 2 * self.max_entries:
+                    self._compact()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'text': text, 'result': result, 'latency': latency}, ensure_ascii=False) + '\n')
+                self.logged += 1
+
+    def _compact(self):
+        # Rewrite the log with only the live entries, oldest first; the newest
+        # one is appended by add() right after
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            ordered = self.entries[self._next:] + self.entries[:self._next]
+            for entry in ordered[:-1]:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self.logged = len(self.entries) - 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': (self.hits / self.lookups) if self.lookups else 0.0,
+                'latency_saved_seconds': round(self.latency_saved, 3),
+                'mean_lookup_ms': round(self.lookup_time / self.lookups * 1000, 3) if self.lookups else 0.0,
+            }
+
+
+_semantic_cache = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Returns the process-wide SemanticCache, or None when numpy isn't installed
+    or SEMANTIC_CACHE_THRESHOLD is set above 1 (disabled).
+    """
+    global _semantic_cache
+    if np is None or float(os.getenv('SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD)) > 1:
+        return None
+    with _semantic_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+        return _semantic_cache
@@ -0,0 +1,345 @@
+"""
+Structured-output handling for JSON-producing LLM calls: a tolerant
+extractor/repairer, schema validation with light coercion, one targeted
+repair retry, and parse-failure metrics.
+"""
+import ast
+import json
+import re
+import threading
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.S)
+_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+class OptionalKey:
+    """
+    Marks a schema key that is validated when present but never required.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token) for metrics and budgets.
+    """
+    return max(1, len(text or '') // 4)
+
+
+def _find_start(text, expect):
+    openers = {dict: '{', list: '['}.get(expect, '{[')
+    positions = [text.find(ch) for ch in openers if text.find(ch) != -1]
+    return min(positions) if positions else -1
+
+
+def _normalize_quotes(text):
+    """
+    Rewrites single-quoted strings as double-quoted ones and Python literals
+    as JSON ones. An apostrophe only closes a single-quoted string when the
+    next non-space character is structural, so "customer's" survives.
+    """
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif ch == "'":
+            j = i + 1
+            buf = []
+            while j < n:
+                c = text[j]
+                if c == '\\' and j + 1 < n:
+                    buf.append(text[j:j + 2])
+                    j += 2
+                    continue
+                if c == "'":
+                    k = j + 1
+                    while k < n and text[k] in ' \t\r\n':
+                        k += 1
+                    if k >= n or text[k] in ',:}]':
+                        break
+                if c == '"':
+                    buf.append('\\"')
+                elif c == '\n':
+                    buf.append('\\n')
+                else:
+                    buf.append(c)
+                j += 1
+            out.append('"' + ''.join(buf) + '"')
+            i = j + 1
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+        else:
+            out.append(ch)
+            i += 1
+    return ''.join(out)
+
+
+def _close_truncated(text):
+    """
+    Closes an unterminated string and any brackets left open by a truncated completion.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r'[,:]\s*$', '', text.rstrip())
+    return text + ''.join(reversed(stack))
+
+
+def _balanced_slice(text, start):
+    """
+    Returns text from `start` through its matching closing bracket (quote-aware),
+    or to the end of the text if it never closes.
+    """
+    depth = 0
+    quote = None
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == quote:
+                quote = None
+        elif ch == '"':
+            quote = ch
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def loads_tolerant(text, expect=None):
+    """
+    Parses JSON out of an LLM completion: strips code fences and surrounding
+    prose, then falls back to repairing single quotes, Python literals,
+    trailing commas and truncation. Raises StructuredOutputError if nothing parses.
+    """
+    if text is None:
+        raise StructuredOutputError("empty completion")
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = _find_start(text, expect)
+    if start == -1:
+        raise StructuredOutputError("no JSON object or array found")
+    candidate = _balanced_slice(text, start)
+    attempts = [candidate]
+    repaired = _normalize_quotes(candidate)
+    repaired = re.sub(r',\s*([}\]])', r'\1', repaired)
+    attempts.append(repaired)
+    attempts.append(_close_truncated(repaired))
+    for attempt in attempts:
+        try:
+            return json.loads(attempt)
+        except ValueError:
+            continue
+    try:
+        value = ast.literal_eval(candidate)
+        if isinstance(value, (dict, list)):
+            return value
+    except Exception:
+        pass
+    raise StructuredOutputError("could not repair JSON")
+
+
+def _coerce(value, kind):
+    if kind is dict:
+        # Mappings in these schemas are always item -> list of strings
+        if isinstance(value, list):
+            # [{"item": ..., "questions": [...]}] instead of a mapping
+            pairs = [tuple(v.values())[:2] for v in value if isinstance(v, dict) and len(v) >= 2]
+            value = dict(pairs)
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"expected an object, got {type(value).__name__}")
+        return {str(k): _coerce(v, list) for k, v in value.items()}
+    if kind is list:
+        if isinstance(value, list):
+            return [str(v) if not isinstance(v, str) else v for v in value]
+        if isinstance(value, str):
+            return [line.strip('-* ').strip() for line in value.split('\n') if line.strip()]
+        raise StructuredOutputError(f"expected a list, got {type(value).__name__}")
+    if kind is str:
+        if isinstance(value, list):
+            return ' '.join(str(v) for v in value)
+        return str(value)
+    if kind is float:
+        if isinstance(value, str):
+            value = value.strip().rstrip('%')
+        number = float(value)
+        return number / 100 if number > 1 else number
+    return value
+
+
+def validate(data, schema):
+    """
+    Checks that `data` matches `schema` and coerces near-misses. `schema` is
+    either a {key: type} dict for objects or the element type for a list
+    (e.g. `[str]`). Returns (data, errors).
+    """
+    errors = []
+    if isinstance(schema, list):
+        if isinstance(data, dict) and len(data) == 1:
+            # {"questions": [...]} when a bare list was asked for
+            data = next(iter(data.values()))
+        if not isinstance(data, list):
+            return data, [f"expected a JSON list, got {type(data).__name__}"]
+        try:
+            return [_coerce(item, schema[0]) for item in data], []
+        except (StructuredOutputError, ValueError, TypeError) as e:
+            return data, [str(e)]
+    if not isinstance(data, dict):
+        return data, [f"expected a JSON object, got {type(data).__name__}"]
+    result = dict(data)
+    for key, kind in schema.items():
+        optional = isinstance(kind, OptionalKey)
+        if optional:
+            kind = kind.kind
+        if key not in data:
+            if not optional:
+                errors.append(f"missing key '{key}'")
+            continue
+        try:
+            result[key] = _coerce(data[key], kind)
+        except (StructuredOutputError, ValueError, TypeError) as e:
+            errors.append(f"key '{key}': {e}")
+    return result, errors
+
+
+class ParseMetrics:
+    """
+    Counters for structured-output parsing, so discarded completions are visible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.completions = 0
+        self.parsed_clean = 0
+        self.repaired_locally = 0
+        self.repair_retries = 0
+        self.repair_retry_successes = 0
+        self.failures = 0
+        self.wasted_tokens = 0
+
+    def record(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'completions': self.completions,
+                'parsed_clean': self.parsed_clean,
+                'repaired_locally': self.repaired_locally,
+                'repair_retries': self.repair_retries,
+                'repair_retry_successes': self.repair_retry_successes,
+                'failures': self.failures,
+                'parse_failure_rate': (self.failures / self.completions) if self.completions else 0.0,
+                'wasted_tokens': self.wasted_tokens,
+            }
+
+
+metrics = ParseMetrics()
+
+
+def parse_structured(text, schema):
+    """
+    Returns (data, errors) for a completion without any retry.
+    Records whether it parsed cleanly or needed local repair.
+    """
+    expect = list if isinstance(schema, list) else dict
+    try:
+        data = json.loads(text)
+        clean = True
+    except (TypeError, ValueError):
+        clean = False
+        try:
+            data = loads_tolerant(text, expect)
+        except StructuredOutputError as e:
+            return None, [str(e)]
+    data, errors = validate(data, schema)
+    if not errors:
+        metrics.record(**({'parsed_clean': 1} if clean else {'repaired_locally': 1}))
+    return data, errors
+
+
+def repair_prompt(text, schema, errors):
+    if isinstance(schema, list):
+        shape = "a JSON list of strings"
+    else:
+        shape = "a JSON object with keys " + ', '.join(f'"{key}"' for key in schema
+                                                      if not isinstance(schema[key], OptionalKey))
+    return (
+        "Your previous response could not be used: " + '; '.join(errors) + ".\n"
+        f"Return only {shape}, using double quotes, with no code fences or extra text.\n"
+        "Previous response:\n" + text
+    )
+
+
+def complete_structured(complete, prompt, schema, retry=True):
+    """
+    Calls `complete(prompt)` and returns validated data, making at most one
+    targeted repair call when the output can't be parsed or is missing keys.
+    Returns None if no provider answered; raises StructuredOutputError if the
+    output is still unusable after the retry.
+    """
+    text = complete(prompt)
+    if text is None:
+        return None
+    metrics.record(completions=1)
+    data, errors = parse_structured(text, schema)
+    if not errors:
+        return data
+    if retry:
+        metrics.record(repair_retries=1)
+        fixed = complete(repair_prompt(text, schema, errors))
+        if fixed is not None:
+            data, retry_errors = parse_structured(fixed, schema)
+            if not retry_errors:
+                metrics.record(repair_retry_successes=1, wasted_tokens=estimate_tokens(text))
+                return data
+            errors = retry_errors
+            text = text + fixed
+    metrics.record(failures=1, wasted_tokens=estimate_tokens(text))
+    raise StructuredOutputError('; '.join(errors))
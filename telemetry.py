@@ -0,0 +1,272 @@
+"""
+Lightweight tracing for the triage pipeline. Pipeline stages and provider
+calls are recorded as spans carrying latency, provider, model, token counts,
+estimated cost, cache status and parse success. Spans are kept in a bounded
+in-process buffer (for per-session panels), folded into cumulative counters
+(for OpenMetrics export) and optionally appended to a JSONL file
+(TELEMETRY_JSONL).
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# USD per 1K (prompt, completion) tokens; override with TELEMETRY_PRICES='{"model": [p, c]}'
+PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.0025, 0.01),
+    'mixtral-8x7b-32768': (0.00024, 0.00024),
+    'llama-3.1-8b-instant': (0.00005, 0.00008),
+    'llama-3.1-70b-versatile': (0.00059, 0.00079),
+    'gemini-pro': (0.000125, 0.000375),
+    'gemini-1.5-flash': (0.000075, 0.0003),
+    'gemini-1.5-pro': (0.00125, 0.005),
+    'command-light': (0.0003, 0.0006),
+    'command': (0.001, 0.002),
+    'command-r-plus': (0.0025, 0.01),
+}
+
+_session = contextvars.ContextVar('telemetry_session', default=None)
+_current = contextvars.ContextVar('telemetry_span', default=None)
+_meter = contextvars.ContextVar('telemetry_meter', default=None)
+
+
+def _prices():
+    override = os.getenv('TELEMETRY_PRICES')
+    if not override:
+        return PRICES
+    try:
+        return {**PRICES, **{k: tuple(v) for k, v in json.loads(override).items()}}
+    except (ValueError, TypeError):
+        return PRICES
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """
+    Returns the estimated USD cost of a call, or 0.0 for unknown models.
+    """
+    prompt_price, completion_price = _prices().get(model, (0.0, 0.0))
+    return (prompt_tokens or 0) / 1000 * prompt_price + (completion_tokens or 0) / 1000 * completion_price
+
+
+def new_session_id():
+    return uuid.uuid4().hex[:12]
+
+
+def set_session(session_id):
+    """
+    Tags spans recorded in the current context with `session_id`.
+    """
+    _session.set(session_id)
+
+
+def annotate(**attributes):
+    """
+    Adds attributes to the innermost active span, if any.
+    """
+    span = _current.get()
+    if span is not None:
+        span['attributes'].update({k: v for k, v in attributes.items() if v is not None})
+
+
+@contextmanager
+def meter():
+    """
+    Yields a dict accumulating the provider calls, tokens and estimated cost
+    recorded in the enclosed block (including tasks and threads started with
+    a copy of its context).
+    """
+    totals = {'calls': 0, 'tokens': 0, 'cost_usd': 0.0}
+    token = _meter.set(totals)
+    try:
+        yield totals
+    finally:
+        _meter.reset(token)
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Tracer:
+    def __init__(self, max_spans=5000):
+        self.spans = deque(maxlen=max_spans)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, kind='stage', **attributes):
+        """
+        Records a span around the enclosed block. The yielded dict's
+        'attributes' may be updated (directly or via annotate()).
+        """
+        parent = _current.get()
+        span = {
+            'name': name,
+            'kind': kind,
+            'session': _session.get(),
+            'parent': parent['name'] if parent is not None else None,
+            'start': time.time(),
+            'attributes': {k: v for k, v in attributes.items() if v is not None},
+        }
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['attributes']['error'] = type(e).__name__
+            raise
+        finally:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # A generator closed from another context (e.g. garbage-collected mid-stream)
+                _current.set(parent)
+            span['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            self.record(span)
+
+    def record(self, span):
+        attrs = span['attributes']
+        if span['kind'] == 'provider' and 'cost_usd' not in attrs:
+            attrs['cost_usd'] = round(estimate_cost(attrs.get('model'), attrs.get('prompt_tokens'),
+                                                    attrs.get('completion_tokens')), 6)
+        totals = _meter.get() if span['kind'] == 'provider' else None
+        with self._lock:
+            self.spans.append(span)
+            self._count(span)
+            if totals is not None:
+                totals['calls'] += 1
+                totals['tokens'] += (attrs.get('prompt_tokens') or 0) + (attrs.get('completion_tokens') or 0)
+                totals['cost_usd'] += attrs.get('cost_usd') or 0.0
+        path = os.getenv('TELEMETRY_JSONL')
+        if path:
+            line = json.dumps(span, ensure_ascii=False, default=str)
+            with self._lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def _count(self, span):
+        attrs = span['attributes']
+        if span['kind'] == 'provider':
+            labels = (('provider', attrs.get('provider', '')), ('model', attrs.get('model', '')))
+            outcome = 'error' if 'error' in attrs else 'ok'
+            self._add('llm_provider_requests', labels + (('outcome', outcome),), 1)
+            self._add('llm_provider_latency_seconds_sum', labels, span['latency_ms'] / 1000)
+            self._add('llm_provider_latency_seconds_count', labels, 1)
+            self._add('llm_provider_tokens', labels + (('type', 'prompt'),), attrs.get('prompt_tokens') or 0)
+            self._add('llm_provider_tokens', labels + (('type', 'completion'),), attrs.get('completion_tokens') or 0)
+            self._add('llm_provider_cost_usd', labels, attrs.get('cost_usd') or 0.0)
+        else:
+            labels = (('stage', span['name']),)
+            self._add('pipeline_stage_latency_seconds_sum', labels, span['latency_ms'] / 1000)
+            self._add('pipeline_stage_latency_seconds_count', labels, 1)
+        if 'cache' in attrs:
+            self._add('llm_cache_lookups', (('status', attrs['cache']),), 1)
+        if 'parse_ok' in attrs:
+            self._add('llm_structured_parses', (('ok', str(bool(attrs['parse_ok'])).lower()),), 1)
+
+    def _add(self, metric, labels, value):
+        key = (metric, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def session_spans(self, session_id):
+        with self._lock:
+            return [s for s in self.spans if s['session'] == session_id]
+
+    def summary(self, session_id=None):
+        """
+        Returns per-stage rows (calls, mean/p95 latency, tokens, cost) for a
+        session, or for every buffered span when session_id is None.
+        """
+        with self._lock:
+            spans = [s for s in self.spans if session_id is None or s['session'] == session_id]
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span['name'], {'stage': span['name'], 'calls': 0, 'latencies': [],
+                                                 'tokens': 0, 'cost_usd': 0.0, 'cache_hits': 0})
+            attrs = span['attributes']
+            row['calls'] += 1
+            row['latencies'].append(span['latency_ms'])
+            row['tokens'] += (attrs.get('prompt_tokens') or 0) + (attrs.get('completion_tokens') or 0)
+            row['cost_usd'] += attrs.get('cost_usd') or 0.0
+            row['cache_hits'] += 1 if attrs.get('cache') in ('hit', 'semantic', 'rules') else 0
+        result = []
+        for row in rows.values():
+            latencies = row.pop('latencies')
+            row['mean_ms'] = round(sum(latencies) / len(latencies), 1)
+            row['p95_ms'] = round(_percentile(latencies, 0.95), 1)
+            row['cost_usd'] = round(row['cost_usd'], 6)
+            result.append(row)
+        return sorted(result, key=lambda r: -r['mean_ms'] * r['calls'])
+
+    def to_openmetrics(self):
+        """
+        Returns cumulative counters in OpenMetrics text exposition format.
+        """
+        with self._lock:
+            items = sorted(self.counters.items())
+        families = {}
+        for (metric, labels), value in items:
+            if metric.endswith('_sum') or metric.endswith('_count'):
+                family, kind = metric.rsplit('_', 1)[0], 'summary'
+                sample = metric
+            else:
+                family, kind = metric, 'counter'
+                sample = metric + '_total'
+            families.setdefault((family, kind), []).append((sample, labels, value))
+        lines = []
+        for (family, kind), samples in families.items():
+            lines.append(f'# TYPE {family} {kind}')
+            for sample, labels, value in samples:
+                label_text = ','.join(f'{k}="{str(v)}"' for k, v in labels)
+                lines.append(f'{sample}{{{label_text}}} {value}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def export_jsonl(self, path, session_id=None):
+        """
+        Writes buffered spans (optionally for one session) to a JSONL file.
+        """
+        with self._lock:
+            spans = [s for s in self.spans if session_id is None or s['session'] == session_id]
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + '\n')
+        return len(spans)
+
+
+tracer = Tracer()
+
+
+def span(name, kind='stage', **attributes):
+    return tracer.span(name, kind, **attributes)
+
+
+def stage(name):
+    """
+    Decorator recording each call of a pipeline function as a stage span.
+    Generator functions are timed until the generator is exhausted.
+    """
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    yield from fn(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def llm_env(monkeypatch, tmp_path):
+    """
+    A configured (fake) OpenAI key with every shortcut that would hide LLM
+    calls disabled, and fresh process-wide caches on a temporary path.
+    """
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setenv('RULES_SKIP_LLM_CONFIDENCE', '2')
+    monkeypatch.setenv('SEMANTIC_CACHE_THRESHOLD', '2')
+    monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm_cache.sqlite3'))
+    monkeypatch.setenv('SEMANTIC_CACHE_PATH', '')
+    monkeypatch.setenv('PREFETCH', 'off')
+    monkeypatch.delenv('LLM_CACHE_BYPASS', raising=False)
+    import llm_cache
+    import semantic_cache
+    monkeypatch.setattr(llm_cache, '_cache', None)
+    monkeypatch.setattr(semantic_cache, '_semantic_cache', None)
+    return monkeypatch
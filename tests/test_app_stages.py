@@ -0,0 +1,118 @@
+"""
+Regression tests for the per-stage memoization in app.py (run_stage /
+cached_stage): widget reruns with unchanged stage inputs must not call the
+LLM again, and a changed input must cost exactly one new call.
+
+    python -m pytest -q tests
+"""
+import json
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+CHECKLIST = ["Confirm asset inventory", "Verify patch status", "Check MFA enforcement"]
+
+
+def _parse_response(with_questions):
+    return {
+        'checklist': CHECKLIST,
+        'broker_questions': ["Is MFA enabled?"],
+        'risk_mitigation': ["Implement monitoring"],
+        'remediation': "Patch the server.",
+        'recommendation': "Request fix",
+        'confidence': 0.9,
+        'broker_summary': "Server needs patching.",
+        'explanation': "Missing controls.",
+        'checklist_questions': {item: [f"Is '{item}' done?"] for item in CHECKLIST} if with_questions else {},
+    }
+
+
+class CountingPool:
+    """
+    Stands in for ProviderPool.complete_sync: answers every prompt with a
+    valid response for its stage and counts the calls.
+    """
+
+    def __init__(self, with_questions=True):
+        self.with_questions = with_questions
+        self.calls = []
+
+    def complete_sync(self, prompt, order=None, hedge=True, models=None, max_tokens=None, json_mode=False):
+        from providers import Completion
+        self.calls.append(prompt)
+        if 'Generate a list of 2-5' in prompt:
+            text = json.dumps(["Is MFA enabled?", "Are all systems patched?"])
+        else:
+            text = json.dumps(_parse_response(self.with_questions))
+        provider = (order or ['openai'])[0]
+        return Completion(provider, (models or {}).get(provider, 'fake-model'), text, 10, 10)
+
+
+@pytest.fixture
+def fake_pool(llm_env):
+    # Only the session-state memo may save calls, so the shared response cache is off too
+    llm_env.setenv('LLM_CACHE_BYPASS', '1')
+    from providers import get_pool
+
+    def install(with_questions=True):
+        counter = CountingPool(with_questions)
+        llm_env.setattr(get_pool(), 'complete_sync', counter.complete_sync)
+        return counter
+
+    return install
+
+
+def _app():
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=30)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def _rerun(at, widget):
+    widget.run()
+    assert not at.exception
+    return at
+
+
+def test_parse_stage_reruns(fake_pool):
+    pool = fake_pool()
+    at = _app()
+    assert pool.calls == []
+
+    at.text_area[0].input("An unpatched Apache server was found by a vulnerability scan.")
+    _rerun(at, at.text_area[0])
+    assert len(pool.calls) == 1
+
+    # Same incident text: full reruns and widget reruns reuse the parse
+    _rerun(at, at.button[0].click())
+    _rerun(at, at.checkbox[0].check())
+    _rerun(at, at.radio(key='broker_q_0').set_value('No'))
+    assert len(pool.calls) == 1
+
+    at.text_area[0].input("An exposed RDP service was found by an external scan.")
+    _rerun(at, at.text_area[0])
+    assert len(pool.calls) == 2
+
+
+def test_broker_questions_stage_reruns(fake_pool):
+    # No per-item questions in the parse, so broker questions need their own call
+    pool = fake_pool(with_questions=False)
+    at = _app()
+    at.text_area[0].input("An unpatched Apache server was found by a vulnerability scan.")
+    _rerun(at, at.text_area[0])
+    assert len(pool.calls) == 1
+
+    _rerun(at, at.checkbox[0].check())
+    assert len(pool.calls) == 2
+
+    # Same checklist selection: answer changes and full reruns reuse the questions
+    _rerun(at, at.radio(key='broker_q_0').set_value('No'))
+    _rerun(at, at.button[0].click())
+    assert len(pool.calls) == 2
+
+    _rerun(at, at.checkbox[1].check())
+    assert len(pool.calls) == 3
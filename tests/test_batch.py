@@ -0,0 +1,56 @@
+"""
+Batch triage must record provider outages as errors, so they are retried
+and picked up again on resume, never stored as rules/stub parses.
+"""
+import asyncio
+import json
+
+import pytest
+
+INCIDENT = {'id': 'inc-1', 'title': "Suspicious login",
+            'description': "An unusual sign-in was seen on a workstation.", 'risk_level': 'Medium'}
+
+
+@pytest.fixture
+def outage(llm_env):
+    """
+    Every provider call fails; returns the list of prompts attempted.
+    """
+    import batch
+    from providers import ProviderError, get_pool
+    calls = []
+
+    def complete_sync(prompt, *args, **kwargs):
+        calls.append(prompt)
+        raise ProviderError("all providers failed")
+
+    llm_env.setattr(get_pool(), 'complete_sync', complete_sync)
+    llm_env.setattr(batch.time, 'sleep', lambda seconds: None)
+    return calls
+
+
+def test_parse_outage_is_an_error_and_retried(outage):
+    from batch import triage_incident
+    record = triage_incident(INCIDENT, ['parse'], max_retries=0)
+    assert 'parse' not in record
+    assert record['errors']['parse'].startswith('ProviderError')
+    single = len(outage)
+
+    triage_incident(INCIDENT, ['parse'], max_retries=2)
+    assert len(outage) - single == 3 * single
+
+
+def test_parse_outage_is_not_checkpointed(outage, tmp_path):
+    from batch import load_checkpoint, run_batch
+    source = tmp_path / 'incidents.json'
+    source.write_text(json.dumps([INCIDENT]), encoding='utf-8')
+    output = tmp_path / 'triage.jsonl'
+    summary = asyncio.run(run_batch(str(source), str(output), 1, ['parse'], max_retries=0))
+    assert summary['failed'] == 1
+    assert load_checkpoint(str(output)) == set()
+
+
+def test_interactive_parse_still_falls_back(outage):
+    from utils import llm_parse_incident_and_generate_all
+    result = llm_parse_incident_and_generate_all(INCIDENT['description'])
+    assert result['checklist']
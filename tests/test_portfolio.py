@@ -0,0 +1,25 @@
+"""
+Portfolio rows are keyed like the incident store, so id-less incidents stay
+distinct and broker answers land on the right row.
+"""
+from incident_store import incident_id
+from portfolio import Portfolio
+
+RECORDS = [
+    {'title': "Open RDP", 'risk_level': 'High', 'risk_contribution_score': 20},
+    {'title': "Weak passwords", 'risk_level': 'Low', 'risk_contribution_score': 10},
+    {'id': 7, 'title': "Public bucket", 'risk_level': 'Medium', 'risk_contribution_score': 15},
+]
+
+
+def test_incidents_without_id_get_distinct_store_ids():
+    portfolio = Portfolio.from_records(RECORDS)
+    assert list(portfolio.ids) == [incident_id(record) for record in RECORDS]
+    assert len(set(portfolio.ids)) == 3
+    assert portfolio.ids[2] == '7'
+
+
+def test_answers_apply_to_the_matching_incident():
+    portfolio = Portfolio.from_records(RECORDS)
+    portfolio.apply_answers({incident_id(RECORDS[1]): ['No']})
+    assert list(portfolio.modifier == 1.0) == [True, False, True]
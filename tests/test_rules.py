@@ -0,0 +1,65 @@
+"""
+Rule confidence and the LLM-skipping fast path.
+"""
+import pytest
+
+from rules import RuleSet, fast_path
+
+EXAMPLE_PROMPTS = {
+    # Also matches the generic public-exposure class
+    "A public S3 bucket with sensitive configs was found by our cloud scanner on June 10, 2025.": None,
+    "Multiple admin accounts were found using weak passwords and no MFA on June 12, 2025.": None,
+    "An unpatched Apache server (2.4.29) with critical CVEs was detected by a vulnerability scan.": None,
+    "A phishing email impersonating IT support was reported by several users last week.": 'phishing',
+}
+
+
+@pytest.fixture
+def ruleset():
+    return RuleSet()
+
+
+def _confidences(ruleset, text):
+    return {rule['id']: confidence for rule, confidence in ruleset.classify(text)}
+
+
+def test_overlapping_patterns_are_not_independent_evidence(ruleset):
+    # "public s3", "s3 bucket" and "bucket" all describe the same finding
+    assert _confidences(ruleset, "A public S3 bucket was found.")['public_storage'] == 0.9
+    assert _confidences(ruleset, "Unpatched server with known CVEs and outdated packages.")['unpatched_software'] == 0.8
+
+
+def test_denied_threats_are_not_classified(ruleset):
+    assert 'ransomware' not in _confidences(ruleset, "No evidence of ransomware on the file server.")
+    assert 'phishing' not in _confidences(ruleset, "The email was not phishing.")
+    # A new clause ends the denial
+    assert 'phishing' in _confidences(ruleset, "No malware found, but a phishing email was reported.")
+
+
+def test_denial_is_the_finding_for_control_gaps(ruleset):
+    assert 'missing_mfa' in _confidences(ruleset, "Admin accounts without MFA.")
+    assert 'open_database' in _confidences(ruleset, "Elasticsearch cluster with no authentication.")
+
+
+@pytest.mark.parametrize('text, rule_id', EXAMPLE_PROMPTS.items())
+def test_example_prompts(ruleset, text, rule_id):
+    result = fast_path(text, threshold=0.9)
+    if rule_id is None:
+        assert result is None
+    else:
+        assert result is not None and list(_confidences(ruleset, text)) == [rule_id]
+
+
+@pytest.mark.parametrize('text', [
+    "Ransomware encrypted files on the file server and data was exfiltrated to a threat actor.",
+    "Phishing email led to mimikatz credential dumping on a workstation.",
+    "A phishing email was reported and RDP is exposed to the internet.",
+    "No evidence of ransomware; a phishing email was reported.",
+])
+def test_fast_path_defers_to_llm(text):
+    assert fast_path(text, threshold=0.5) is None
+
+
+def test_fast_path_answers_a_single_clear_class():
+    result = fast_path("A phishing email was reported by the finance team.", threshold=0.9)
+    assert result is not None and result['source'] == 'rules'
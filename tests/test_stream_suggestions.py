@@ -0,0 +1,109 @@
+"""
+llm_stream_suggestions_and_remediation must end with the same complete,
+coerced result as llm_generate_suggestions_and_remediation, whether the
+fields come from a live stream or from a cache entry the blocking call wrote.
+"""
+import json
+
+import pytest
+
+FIELDS = ['risk_mitigation', 'remediation', 'recommendation', 'confidence', 'broker_summary', 'explanation']
+ARGS = ("Unpatched Apache 2.4.29 on a public web server.", ["Verify patch status"],
+        ["Are all systems patched?"], ["No"])
+
+# Valid JSON, but with values the schema has to coerce
+LOOSE = json.dumps({
+    'risk_mitigation': "- Patch it\n- Monitor it",
+    'remediation': "Upgrade Apache.",
+    'recommendation': "Request fix",
+    'confidence': "85%",
+    'broker_summary': "Apache needs patching.",
+    'explanation': "Unpatched public server.",
+})
+# Cut off inside the last value; only parses after local repair
+TRUNCATED = LOOSE[:LOOSE.index('"explanation": "') + len('"explanation": "')] + 'e'
+
+
+@pytest.fixture
+def openai(llm_env):
+    """
+    The OpenAI provider with stream() and the pool's complete_sync() replaced
+    by fakes; set `stream_text` / `complete_text` to script their answers.
+    """
+    from providers import Completion, get_pool
+    pool = get_pool()
+    provider = pool.get('openai')
+    calls = {'stream': 0, 'complete': 0}
+
+    def stream(prompt, model=None, max_tokens=None, json_mode=False):
+        calls['stream'] += 1
+        text = provider.stream_text
+        for i in range(0, len(text), 7):
+            yield text[i:i + 7]
+
+    def complete_sync(prompt, order=None, hedge=True, models=None, max_tokens=None, json_mode=False):
+        calls['complete'] += 1
+        return Completion('openai', (models or {}).get('openai', provider.default_model),
+                          provider.complete_text, 10, 10)
+
+    llm_env.setattr(provider, 'stream', stream)
+    llm_env.setattr(pool, 'complete_sync', complete_sync)
+    llm_env.setattr(provider, 'stream_text', LOOSE, raising=False)
+    llm_env.setattr(provider, 'complete_text', LOOSE, raising=False)
+    provider.calls = calls
+    return provider
+
+
+def _stream(*args):
+    from utils import llm_stream_suggestions_and_remediation
+    result = {}
+    for field, value in llm_stream_suggestions_and_remediation(*(args or ARGS)):
+        result[field] = value
+    return result
+
+
+def test_streamed_fields_are_coerced_like_blocking_call(openai):
+    from utils import llm_generate_suggestions_and_remediation
+    streamed = _stream()
+    assert streamed['risk_mitigation'] == ['Patch it', 'Monitor it']
+    assert streamed['confidence'] == pytest.approx(0.85)
+    assert openai.calls == {'stream': 1, 'complete': 0}
+    # The clean completion was cached; the blocking call returns the same result from it
+    assert llm_generate_suggestions_and_remediation(*ARGS) == streamed
+    assert openai.calls['complete'] == 0
+
+
+def test_truncated_stream_yields_repaired_last_field(openai):
+    openai.stream_text = TRUNCATED
+    streamed = _stream()
+    assert set(streamed) == set(FIELDS)
+    assert streamed['explanation'] == 'e'
+
+
+def test_cache_hit_on_repaired_entry_is_complete_and_coerced(openai):
+    from utils import llm_generate_suggestions_and_remediation
+    # The blocking call caches the raw completion even though it needed repair
+    openai.complete_text = TRUNCATED
+    blocking = llm_generate_suggestions_and_remediation(*ARGS)
+    assert set(blocking) == set(FIELDS)
+
+    streamed = _stream()
+    assert openai.calls['stream'] == 0
+    assert streamed == blocking
+    assert streamed['risk_mitigation'] == ['Patch it', 'Monitor it']
+    assert streamed['confidence'] == pytest.approx(0.85)
+
+
+def test_unusable_cache_entry_is_dropped_and_falls_back(openai):
+    from llm_cache import get_cache
+    from router import get_router
+    from utils import _suggestions_prompt
+    prompt = _suggestions_prompt(*ARGS)
+    model = get_router().route(ARGS[0], 'suggestions', prompt).models['openai']
+    get_cache().set('openai', model, prompt, 'Sorry, I cannot help with that.')
+
+    streamed = _stream()
+    assert set(streamed) == set(FIELDS)
+    assert openai.calls['stream'] == 0
+    assert openai.calls['complete'] >= 1
+    assert get_cache().get('openai', model, prompt) != 'Sorry, I cannot help with that.'
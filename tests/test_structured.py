@@ -0,0 +1,64 @@
+"""
+Tolerant parsing of LLM completions: code fences, prose, single quotes,
+apostrophes, Python literals and truncated output.
+"""
+import pytest
+
+from structured import (
+    OptionalKey,
+    StructuredOutputError,
+    _close_truncated,
+    _normalize_quotes,
+    loads_tolerant,
+    parse_structured
+)
+
+
+def test_normalize_quotes_keeps_apostrophes_inside_strings():
+    assert _normalize_quotes("{'note': 'the customer's laptop', 'n': 1}") == \
+        '{"note": "the customer\'s laptop", "n": 1}'
+
+
+def test_normalize_quotes_escapes_double_quotes_and_maps_literals():
+    assert _normalize_quotes("{'a': 'say \"hi\"', 'b': True, 'c': None, 'd': False}") == \
+        '{"a": "say \\"hi\\"", "b": true, "c": null, "d": false}'
+    # Words inside double-quoted strings are left alone
+    assert _normalize_quotes('{"a": "None of True"}') == '{"a": "None of True"}'
+
+
+def test_close_truncated_closes_string_and_brackets():
+    assert _close_truncated('{"a": ["x", "y') == '{"a": ["x", "y"]}'
+    # A dangling separator is dropped before closing
+    assert _close_truncated('{"a": 1,') == '{"a": 1}'
+    assert _close_truncated('{"a": {"b": "c}') == '{"a": {"b": "c}"}}'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Here you go:\n```json\n{"a": [1, 2]}\n```\nAnything else?', {'a': [1, 2]}),
+    ("```\n{'a': 'the insured's server', 'b': True}\n```", {'a': "the insured's server", 'b': True}),
+    ("Sure! {'ok': None, 'items': ['x', 'y',],}", {'ok': None, 'items': ['x', 'y']}),
+    ('{"summary": "Patch the server", "steps": ["Upgrade", "Reb', {'summary': "Patch the server",
+                                                                  'steps': ['Upgrade', 'Reb']}),
+])
+def test_loads_tolerant_repairs(text, expected):
+    assert loads_tolerant(text) == expected
+
+
+def test_loads_tolerant_prefers_the_expected_container():
+    assert loads_tolerant('Questions: ["a", "b"] for {you}', expect=list) == ['a', 'b']
+
+
+@pytest.mark.parametrize('text', [None, "I can't help with that.", "{{{ not json"])
+def test_loads_tolerant_raises_when_nothing_parses(text):
+    with pytest.raises(StructuredOutputError):
+        loads_tolerant(text)
+
+
+def test_parse_structured_coerces_and_allows_optional_keys():
+    schema = {'steps': list, 'confidence': float, 'extra': OptionalKey(dict)}
+    data, errors = parse_structured("{'steps': '- Patch\\n- Reboot', 'confidence': '85%'", schema)
+    assert errors == []
+    assert data == {'steps': ['Patch', 'Reboot'], 'confidence': pytest.approx(0.85)}
+
+    data, errors = parse_structured('{"confidence": 0.5}', schema)
+    assert errors == ["missing key 'steps'"]
@@ -3,42 +3,121 @@ import os
 for proxy_var in ["HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy", "ALL_PROXY", "all_proxy"]:
     os.environ.pop(proxy_var, None)
 
-import streamlit as st
-# Load secrets into os.environ before importing openai
-if hasattr(st, "secrets"):
-    for key in ["OPENAI_API_KEY", "GEMINI_API_KEY", "COHERE_API_KEY"]:
-        if key in st.secrets:
-            os.environ[key] = st.secrets[key]
+from config import ALL_YES_MODIFIER, ANY_NO_MODIFIER, load_secrets
+# Load secrets into os.environ before any provider SDK is imported
+load_secrets()
 
-try:
-    import openai
-except ImportError:
-    openai = None
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-try:
-    import cohere
-except ImportError:
-    cohere = None
-try:
-    import groq
-except ImportError:
-    groq = None
+import json
+import re
+import time
 
-def generate_remediation(incident):
+import telemetry
+from json_stream import IncrementalJSONParser
+from llm_cache import get_cache
+from providers import DEFAULT_ORDER, Completion, ProviderError, get_pool
+from router import get_router
+from rules import fast_path as rules_fast_path, get_ruleset
+from structured import OptionalKey, StructuredOutputError, complete_structured, estimate_tokens, metrics as parse_metrics, parse_structured, validate
+
+PARSE_SCHEMA = {
+    'checklist': list,
+    'broker_questions': list,
+    'risk_mitigation': list,
+    'remediation': str,
+    'recommendation': str,
+    'confidence': float,
+    'broker_summary': str,
+    'explanation': str,
+    'checklist_questions': OptionalKey(dict),
+}
+
+SUGGESTIONS_SCHEMA = {
+    'risk_mitigation': list,
+    'remediation': str,
+    'recommendation': str,
+    'confidence': float,
+    'broker_summary': str,
+    'explanation': str,
+}
+
+def _llm_completion(prompt, order=DEFAULT_ORDER, bypass_cache=False, json_mode=False, route=None):
+    """
+    Returns a Completion from the first healthy provider in `order`, going
+    through the shared response cache. `route` (from router.py) picks each
+    provider's model and the output budget. Returns None when no provider in
+    `order` is configured; raises ProviderError when all of them fail.
+    """
+    pool = get_pool()
+    candidates = pool.available(order)
+    if not candidates:
+        return None
+    models = route.models if route is not None else {}
+    cache = get_cache()
+    with telemetry.span('llm.completion', kind='llm') as span:
+        # Any candidate's answer will do; one lookup, one hit or miss
+        found = cache.get_first([(p.name, models.get(p.name, p.default_model)) for p in candidates],
+                                prompt, bypass=bypass_cache)
+        if found is not None:
+            span['attributes'].update(cache='hit', provider=found[0], model=found[1])
+            return Completion(*found)
+        span['attributes']['cache'] = 'bypass' if bypass_cache else 'miss'
+        result = pool.complete_sync(prompt, order=[p.name for p in candidates], models=models,
+                                    max_tokens=route.max_tokens if route is not None else None,
+                                    json_mode=json_mode)
+        span['attributes'].update(provider=result.provider, model=result.model)
+    cache.set(result.provider, result.model, prompt, result.text)
+    return result
+
+def _llm_complete(prompt, order=DEFAULT_ORDER, bypass_cache=False, route=None, answered=None):
+    result = _llm_completion(prompt, order, bypass_cache, route=route)
+    if result is None:
+        return None
+    if answered is not None:
+        answered.append(result)
+    return result.text
+
+def _llm_structured(prompt, schema, order=DEFAULT_ORDER, bypass_cache=False, route=None, answered=None):
+    """
+    Returns schema-validated data for a JSON-producing prompt, or None when no
+    provider in `order` is configured. Uses provider JSON mode for object
+    schemas and makes at most one repair call; raises StructuredOutputError
+    if the output is still unusable. Completions used are appended to
+    `answered` when given.
+    """
+    answered = [] if answered is None else answered
+
+    def complete(p):
+        result = _llm_completion(p, order, bypass_cache, json_mode=isinstance(schema, dict), route=route)
+        if result is None:
+            return None
+        answered.append(result)
+        return result.text
+
+    cache = get_cache()
+    try:
+        data = complete_structured(complete, prompt, schema)
+    except StructuredOutputError:
+        telemetry.annotate(parse_ok=False, repair_retry=True)
+        # Don't keep serving an unusable completion from the cache
+        cache.delete(answered[0].provider, answered[0].model, prompt)
+        raise
+    if answered:
+        telemetry.annotate(parse_ok=True, repair_retry=len(answered) > 1)
+    if len(answered) > 1:
+        # Cache the repaired answer under the original prompt
+        cache.set(answered[0].provider, answered[0].model, prompt, json.dumps(data))
+    return data
+
+@telemetry.stage('remediation')
+def generate_remediation(incident, bypass_cache=False):
     """
     Returns dict with keys: remediation_steps, explanation, recommended_action, confidence_score
-    Uses OpenAI if API key is set, else Gemini, else Cohere. No stub fallback.
+    Tries OpenAI, Groq, Gemini, then Cohere, hedging to the next provider when
+    one is slow or erroring. No stub fallback.
     """
     title = incident['title']
     description = incident['description']
     risk = incident['risk_level']
-    openai_key = os.getenv('OPENAI_API_KEY')
-    gemini_key = os.getenv('GEMINI_API_KEY')
-    cohere_key = os.getenv('COHERE_API_KEY')
-    groq_key = os.getenv('GROQ_API_KEY')
     prompt = (
         f"Incident: {title}\nDescription: {description}\nRisk: {risk}\n"
         "Provide:\n"
@@ -48,30 +127,11 @@ def generate_remediation(incident):
         "4. A confidence score (0-1) for your recommendation.\n"
         "Format:\nRemediation: ...\nWhy: ...\nRecommended Action: ...\nConfidence: ..."
     )
-    if openai and openai_key:
-        openai.api_key = openai_key
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        text = resp.choices[0].message.content.strip()
-    elif groq and groq_key:
-        groq_client = groq.Groq(api_key=groq_key)
-        resp = groq_client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        text = resp.choices[0].message.content.strip()
-    elif genai and gemini_key:
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-pro')
-        resp = model.generate_content(prompt)
-        text = resp.text.strip()
-    elif cohere and cohere_key:
-        co = cohere.Client(cohere_key)
-        resp = co.generate(model="command", prompt=prompt, max_tokens=300)
-        text = resp.generations[0].text.strip()
-    else:
+    text = get_router().run(
+        f"{title}\n{description}", 'remediation', prompt,
+        lambda route, answered: _llm_complete(prompt, bypass_cache=bypass_cache, route=route, answered=answered)
+    )
+    if text is None:
         raise RuntimeError("No valid API key found for OpenAI, Gemini, Cohere, or Groq.")
     # Parse response
     remediation, why, rec_action, conf = '', '', '', 0.0
@@ -103,37 +163,38 @@ def generate_broker_summary(remediation, incident):
     summary = f"{title} ({risk} risk): {remediation.split('.')[0]}. Issue addressed to reduce exposure."
     return summary
 
+def _matched_rules(incident):
+    return get_ruleset().classify(f"{incident['title']}\n{incident['description']}")
+
+def _rule_items(matched, field):
+    items = []
+    for rule, _ in matched:
+        for item in rule[field]:
+            if item not in items:
+                items.append(item)
+    return items
+
 def generate_underwriting_checklist(incident):
     """
-    Returns a list of checklist items for underwriting, AI pre-filled.
+    Returns a list of checklist items for underwriting, pre-filled from the
+    matched incident rules (or a generic list when no rule matches).
     """
     title = incident['title']
-    description = incident['description']
-    checklist = [
-        f"Confirm asset inventory for: {title}",
+    checklist = [f"Confirm asset inventory for: {title}"]
+    items = _rule_items(_matched_rules(incident), 'checklist') or [
         f"Verify patch status for affected systems",
         f"Check MFA enforcement for all admin accounts",
         f"Review backup and recovery procedures",
         f"Assess network segmentation and firewall rules",
         f"Validate incident response plan is up to date"
     ]
-    return checklist
+    return checklist + items
 
 def generate_broker_questions(incident):
     """
     Returns a list of incident-specific Yes/No questions for brokers.
     """
-    title = incident['title'].lower()
-    description = incident['description'].lower()
-    questions = []
-    if "mfa" in title or "mfa" in description or "multi-factor" in description:
-        questions.append("Is Multi-Factor Authentication (MFA) enabled for all relevant accounts?")
-    if "rdp" in title or "remote desktop" in description:
-        questions.append("Is RDP access restricted to VPN or internal networks only?")
-    if "patch" in title or "outdated" in description or "unpatched" in description:
-        questions.append("Are all systems fully patched and up to date?")
-    if "public" in title or "exposed" in description:
-        questions.append("Are any sensitive resources exposed to the public internet?")
+    questions = _rule_items(_matched_rules(incident), 'questions')
     if not questions:
         questions = [
             "Are there compensating controls in place for this risk?",
@@ -153,19 +214,18 @@ def adjust_risk_and_suggestions(incident, broker_answers):
     if any(ans == 'No' for ans in broker_answers):
         suggestions.append("Escalate to security team for urgent review.")
         adjusted_remediation = "Immediate action required: address all 'No' responses before proceeding."
-        risk_modifier = 1.2  # Increase risk by 20%
+        risk_modifier = ANY_NO_MODIFIER  # Increase risk by 20%
     elif all(ans == 'Yes' for ans in broker_answers) and broker_answers:
         suggestions.append("No additional broker action required; all controls confirmed.")
         adjusted_remediation = "Proceed with standard remediation as all controls are in place."
-        risk_modifier = 0.8  # Decrease risk by 20%
+        risk_modifier = ALL_YES_MODIFIER  # Decrease risk by 20%
     return suggestions, adjusted_remediation, risk_modifier
 
 def generate_risk_mitigation_suggestions(incident):
     """
     Returns a list of risk mitigation suggestions.
     """
-    title = incident['title']
-    suggestions = [
+    suggestions = _rule_items(_matched_rules(incident), 'mitigations') or [
         f"Recommend upgrading all related services to the latest supported version.",
         f"Implement network monitoring for suspicious activity.",
         f"Enforce least privilege access for all accounts.",
@@ -173,32 +233,31 @@ def generate_risk_mitigation_suggestions(incident):
     ]
     return suggestions
 
-def generate_dynamic_risk_mitigation_suggestions(incident, broker_answers):
+@telemetry.stage('dynamic_mitigation')
+def generate_dynamic_risk_mitigation_suggestions(incident, broker_answers, bypass_cache=False):
     """
     Uses LLM to generate context-aware risk mitigation suggestions based on incident and broker answers.
     """
     title = incident['title']
     description = incident['description']
     risk = incident.get('risk_level', '')
-    openai_key = os.getenv('OPENAI_API_KEY')
     prompt = (
         f"Incident: {title}\nDescription: {description}\nRisk: {risk}\n"
         f"Broker Answers: {broker_answers}\n"
         "Suggest 3-5 specific, actionable risk mitigation steps for this scenario."
     )
-    if openai and openai_key:
-        openai.api_key = openai_key
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        text = resp.choices[0].message.content.strip()
-        suggestions = [line.strip('- ').strip() for line in text.split('\n') if line.strip()]
+    content = get_router().run(
+        f"{title}\n{description}", 'default', prompt,
+        lambda route, answered: _llm_complete(prompt, ['openai'], bypass_cache, route, answered)
+    )
+    if content is not None:
+        suggestions = [line.strip('- ').strip() for line in content.split('\n') if line.strip()]
         return suggestions
     # fallback to static if no LLM
     return generate_risk_mitigation_suggestions(incident)
 
-def llm_parse_incident_and_generate_all(incident_text):
+@telemetry.stage('parse')
+def llm_parse_incident_and_generate_all(incident_text, bypass_cache=False, strict=False):
     """
     Uses LLM to parse a free-text incident and generate:
     - checklist (list of strings)
@@ -209,36 +268,64 @@ def llm_parse_incident_and_generate_all(incident_text):
     - confidence (float or string)
     - broker_summary (string)
     - explanation (string)
+    - checklist_questions (dict of checklist item -> list of broker questions)
+    Incidents the local rule set classifies with enough confidence
+    (RULES_SKIP_LLM_CONFIDENCE) are answered without calling the LLM, as are
+    near-duplicates of previously parsed incidents (SEMANTIC_CACHE_THRESHOLD).
+    When the LLM fails, the result falls back to rules triage or a static
+    stub; with `strict=True` (batch jobs) the error is raised instead, so it
+    is recorded and retried rather than stored as a real parse.
     """
-    openai_key = os.getenv('OPENAI_API_KEY')
+    fast = rules_fast_path(incident_text)
+    if fast is not None:
+        telemetry.annotate(cache='rules')
+        return fast
     prompt = (
         f"Incident: {incident_text}\n"
         "Parse the above incident and generate the following as JSON:\n"
         "{\n"
-        "  'checklist': [list of underwriting checklist items],\n"
-        "  'broker_questions': [list of yes/no questions for brokers],\n"
-        "  'risk_mitigation': [list of risk mitigation suggestions],\n"
-        "  'remediation': 'remediation steps',\n"
-        "  'recommendation': 'underwriter recommendation',\n"
-        "  'confidence': confidence_score (0-1),\n"
-        "  'broker_summary': '2-line broker summary',\n"
-        "  'explanation': 'explain how the recommendation was derived'\n"
+        "  \"checklist\": [list of underwriting checklist items],\n"
+        "  \"broker_questions\": [list of yes/no questions for brokers],\n"
+        "  \"risk_mitigation\": [list of risk mitigation suggestions],\n"
+        "  \"remediation\": \"remediation steps\",\n"
+        "  \"recommendation\": \"underwriter recommendation\",\n"
+        "  \"confidence\": confidence_score (0-1),\n"
+        "  \"broker_summary\": \"2-line broker summary\",\n"
+        "  \"explanation\": \"explain how the recommendation was derived\",\n"
+        "  \"checklist_questions\": {\"<checklist item, copied exactly>\": [1-2 yes/no broker questions that verify that item]}\n"
         "}\n"
-        "Respond with only the JSON."
+        "Respond with only the JSON, using double quotes."
     )
-    if openai and openai_key:
-        openai.api_key = openai_key
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
+    # Imported here so NumPy only loads once an incident actually needs the LLM
+    from semantic_cache import get_semantic_cache
+    semantic = get_semantic_cache() if not bypass_cache else None
+    if semantic is not None and get_pool().available(['openai']):
+        similar, _ = semantic.lookup(incident_text)
+        if similar is not None:
+            telemetry.annotate(cache='semantic')
+            return similar
+    start = time.perf_counter()
+    try:
+        data = get_router().run(
+            incident_text, 'parse', prompt,
+            lambda route, answered: _llm_structured(prompt, PARSE_SCHEMA, ['openai'], bypass_cache, route, answered),
+            confidence=lambda result: result.get('confidence')
         )
-        import json as pyjson
-        try:
-            data = pyjson.loads(resp.choices[0].message.content.strip().replace("'", '"'))
-        except Exception:
-            data = {}
+    except (StructuredOutputError, ProviderError):
+        if strict:
+            raise
+        data = None
+    if data is None and strict:
+        raise RuntimeError("No valid API key found for OpenAI.")
+    if data is not None:
+        if semantic is not None:
+            semantic.add(incident_text, data, time.perf_counter() - start)
         return data
-    # fallback: static stub
+    # fallback: rule-based triage, else static stub
+    triage = get_ruleset().triage(incident_text)
+    telemetry.annotate(fallback='rules' if triage is not None else 'stub')
+    if triage is not None:
+        return triage
     return {
         'checklist': ["Confirm asset inventory", "Verify patch status", "Check MFA enforcement"],
         'broker_questions': ["Is MFA enabled?", "Are all systems patched?"],
@@ -247,69 +334,89 @@ def llm_parse_incident_and_generate_all(incident_text):
         'recommendation': "Request fix",
         'confidence': 0.8,
         'broker_summary': "Incident triaged, remediation in progress.",
-        'explanation': "Recommendation is based on risk and missing controls."
+        'explanation': "Recommendation is based on risk and missing controls.",
+        'checklist_questions': {
+            "Confirm asset inventory": ["Is there an up-to-date inventory of affected assets?"],
+            "Verify patch status": ["Are all systems patched?"],
+            "Check MFA enforcement": ["Is MFA enabled?"]
+        }
     }
 
-def llm_generate_broker_questions_from_checklist(incident_text, checklist_items):
-    openai_key = os.getenv('OPENAI_API_KEY')
+_STOPWORDS = {'a', 'an', 'the', 'is', 'are', 'all', 'for', 'of', 'to', 'and', 'or', 'in', 'on', 'be', 'been', 'there', 'any', 'your', 'it'}
+
+def _question_key(text):
+    return frozenset(w for w in re.findall(r'[a-z0-9]+', text.lower()) if w not in _STOPWORDS)
+
+def _overlap(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def assemble_broker_questions(llm_result, selected_items, similarity=0.8):
+    """
+    Builds the broker questions for a checklist selection from the per-item
+    `checklist_questions` returned by llm_parse_incident_and_generate_all,
+    without another LLM call. Near-duplicate questions (by word overlap) are
+    merged. Returns None if any selected item has no precomputed questions.
+    """
+    mapping = (llm_result or {}).get('checklist_questions') or {}
+    if not mapping:
+        return None
+    keyed = {_question_key(item): questions for item, questions in mapping.items()}
+    merged, seen = [], []
+    for item in selected_items:
+        questions = mapping.get(item)
+        if questions is None:
+            # The model may not copy the item text exactly; take the closest key
+            target = _question_key(item)
+            best = max(keyed, key=lambda k: _overlap(k, target))
+            if _overlap(best, target) < 0.5:
+                return None
+            questions = keyed[best]
+        for question in questions:
+            key = _question_key(question)
+            if any(_overlap(key, other) >= similarity for other in seen):
+                continue
+            seen.append(key)
+            merged.append(question)
+    return merged or None
+
+@telemetry.stage('broker_questions')
+def llm_generate_broker_questions_from_checklist(incident_text, checklist_items, bypass_cache=False):
     prompt = (
         f"Incident: {incident_text}\n"
         f"Selected Underwriting Checklist: {checklist_items}\n"
         "Generate a list of 2-5 clear, specific yes/no broker questions that clarify the status of the selected controls. Respond as a JSON list of strings."
     )
-    if openai and openai_key:
-        openai.api_key = openai_key
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
+    try:
+        questions = get_router().run(
+            incident_text, 'broker_questions', prompt,
+            lambda route, answered: _llm_structured(prompt, [str], ['openai'], bypass_cache, route, answered)
         )
-        import json as pyjson
-        try:
-            # Try to extract a JSON list from the LLM response
-            content = resp.choices[0].message.content.strip()
-            # Remove code block markers if present
-            if content.startswith('```'):
-                content = content.split('\n', 1)[-1].rsplit('```', 1)[0].strip()
-            questions = pyjson.loads(content.replace("'", '"'))
-            # Ensure it's a list of strings
-            if isinstance(questions, list) and all(isinstance(q, str) for q in questions):
-                return questions
-        except Exception:
-            pass
+    except (StructuredOutputError, ProviderError):
+        questions = None
+    if questions:
+        return questions
     # fallback
     return ["Is MFA enabled?", "Are all systems patched?"]
 
-def llm_generate_suggestions_and_remediation(incident_text, checklist_items, broker_questions, broker_answers):
-    openai_key = os.getenv('OPENAI_API_KEY')
-    prompt = (
+def _suggestions_prompt(incident_text, checklist_items, broker_questions, broker_answers):
+    return (
         f"Incident: {incident_text}\n"
         f"Selected Underwriting Checklist: {checklist_items}\n"
         f"Broker Questions: {broker_questions}\n"
         f"Broker Answers: {broker_answers}\n"
         "Based on the above, generate the following as JSON:\n"
         "{\n"
-        "  'risk_mitigation': [list of risk mitigation suggestions],\n"
-        "  'remediation': 'remediation steps',\n"
-        "  'recommendation': 'underwriter recommendation',\n"
-        "  'confidence': confidence_score (0-1),\n"
-        "  'broker_summary': '2-line broker summary',\n"
-        "  'explanation': 'explain how the recommendation was derived'\n"
+        "  \"risk_mitigation\": [list of risk mitigation suggestions],\n"
+        "  \"remediation\": \"remediation steps\",\n"
+        "  \"recommendation\": \"underwriter recommendation\",\n"
+        "  \"confidence\": confidence_score (0-1),\n"
+        "  \"broker_summary\": \"2-line broker summary\",\n"
+        "  \"explanation\": \"explain how the recommendation was derived\"\n"
         "}\n"
-        "Respond with only the JSON."
+        "Respond with only the JSON, using double quotes."
     )
-    if openai and openai_key:
-        openai.api_key = openai_key
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        import json as pyjson
-        try:
-            data = pyjson.loads(resp.choices[0].message.content.strip().replace("'", '"'))
-        except Exception:
-            data = {}
-        return data
-    # fallback
+
+def _suggestions_fallback():
     return {
         'risk_mitigation': ["Upgrade all services", "Implement monitoring"],
         'remediation': "Disable public access and enforce MFA.",
@@ -318,3 +425,117 @@ def llm_generate_suggestions_and_remediation(incident_text, checklist_items, bro
         'broker_summary': "Incident triaged, remediation in progress.",
         'explanation': "Recommendation is based on risk and missing controls."
     }
+
+@telemetry.stage('suggestions')
+def llm_generate_suggestions_and_remediation(incident_text, checklist_items, broker_questions, broker_answers, bypass_cache=False):
+    prompt = _suggestions_prompt(incident_text, checklist_items, broker_questions, broker_answers)
+    try:
+        data = get_router().run(
+            incident_text, 'suggestions', prompt,
+            lambda route, answered: _llm_structured(prompt, SUGGESTIONS_SCHEMA, ['openai'], bypass_cache, route, answered),
+            confidence=lambda result: result.get('confidence')
+        )
+    except (StructuredOutputError, ProviderError):
+        data = None
+    if data is not None:
+        return data
+    # fallback
+    return _suggestions_fallback()
+
+def _coerce_streamed(pairs):
+    """
+    Coerces streamed (field, value) pairs the way the blocking call's schema
+    validation does ("85%" -> 0.85, a bulleted string -> a list). A field
+    that can't be coerced is held back; the final validation then rejects
+    the completion and the fallback re-sends every field.
+    """
+    for field, value in pairs:
+        kind = SUGGESTIONS_SCHEMA.get(field)
+        if kind is None:
+            yield field, value
+            continue
+        data, errors = validate({field: value}, {field: kind})
+        if not errors:
+            yield field, data[field]
+
+@telemetry.stage('suggestions')
+def llm_stream_suggestions_and_remediation(incident_text, checklist_items, broker_questions, broker_answers, bypass_cache=False):
+    """
+    Streaming variant of llm_generate_suggestions_and_remediation.
+    Yields (field, value) pairs (risk_mitigation, remediation, recommendation,
+    confidence, broker_summary, explanation) as soon as each one is complete
+    in the token stream, coerced to the same types the blocking call returns.
+    Shares the cache entry with the non-streaming call.
+    """
+    prompt = _suggestions_prompt(incident_text, checklist_items, broker_questions, broker_answers)
+    pool = get_pool()
+    if not pool.available(['openai']):
+        for field, value in _suggestions_fallback().items():
+            yield field, value
+        return
+    provider = pool.get('openai')
+    # Routed like the non-streaming call, but never escalated: fields are already on screen
+    router = get_router()
+    route = router.route(incident_text, 'suggestions', prompt)
+    model = route.models.get(provider.name, provider.default_model) if route is not None else provider.default_model
+    max_tokens = route.max_tokens if route is not None else None
+    if route is not None:
+        telemetry.annotate(tier=route.tier, complexity=route.complexity)
+    cache = get_cache()
+    started = time.perf_counter()
+    cached = cache.get(provider.name, model, prompt, bypass=bypass_cache)
+    if cached is not None:
+        # Entries may only have parsed after local repair (the blocking call
+        # caches those too), so validate instead of replaying the raw text
+        text = cached
+        data, errors = parse_structured(cached, SUGGESTIONS_SCHEMA)
+        telemetry.annotate(cache='hit' if not errors else 'invalid')
+        if not errors:
+            if route is not None:
+                router.record(route, started, [Completion(provider.name, model, cached)])
+            for field, value in data.items():
+                yield field, value
+            return
+        # Don't keep serving an unusable completion from the cache
+        cache.delete(provider.name, model, prompt)
+    else:
+        telemetry.annotate(cache='bypass' if bypass_cache else 'miss')
+        parser = IncrementalJSONParser()
+        chunks = []
+        streamed = {}
+        try:
+            with telemetry.span('provider.stream', kind='provider', provider=provider.name, model=model) as span:
+                for delta in provider.stream(prompt, model, max_tokens, json_mode=True):
+                    chunks.append(delta)
+                    for field, value in _coerce_streamed(parser.feed(delta)):
+                        streamed[field] = value
+                        yield field, value
+                text = ''.join(chunks).strip()
+                # Streaming responses carry no usage block
+                span['attributes'].update(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(text))
+            parse_metrics.record(completions=1)
+            data, errors = parse_structured(text, SUGGESTIONS_SCHEMA)
+        except Exception as e:
+            # SDK errors mid-stream aren't wrapped in ProviderError
+            text, errors = ''.join(chunks), [f"stream failed: {e}"]
+        if route is not None:
+            completion = Completion(provider.name, model, text, estimate_tokens(prompt), estimate_tokens(text))
+            router.record(route, started, [completion], served=not errors)
+        telemetry.annotate(parse_ok=not errors)
+        if not errors:
+            cache.set(provider.name, model, prompt, text)
+            # Fields only recovered by local repair (e.g. a truncated last value)
+            for field, value in data.items():
+                if field not in streamed or streamed[field] != value:
+                    yield field, value
+            return
+        parse_metrics.record(failures=1, wasted_tokens=estimate_tokens(text))
+    # Fields already streamed may be partial or wrong: re-send every field
+    # from the non-streaming call (repair retry, then the static fallback) so
+    # the caller ends up with a complete result
+    telemetry.annotate(fallback='non_streaming')
+    data = llm_generate_suggestions_and_remediation(
+        incident_text, checklist_items, broker_questions, broker_answers, bypass_cache
+    )
+    for field, value in data.items():
+        yield field, value